@@ -1,19 +1,27 @@
 import os
 import logging
-from flask import Flask, request, jsonify, render_template, send_file, flash, redirect, url_for
-from werkzeug.utils import secure_filename
+from flask import Flask, Request, Response, request, jsonify, render_template, send_file, flash, redirect, url_for
+from werkzeug.utils import secure_filename, cached_property
 from werkzeug.middleware.proxy_fix import ProxyFix
-import uuid
+import secrets
+import hashlib
 import tempfile
 import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import traceback
+import cv2
 
+import extractors.image_extractor
 from extractors.docx_extractor import DocxExtractor
 from extractors.pdf_extractor import PdfExtractor
 from extractors.image_extractor import ImageExtractor
 from utils.data_processor import DataProcessor
 from utils.validators import FileValidator
+from utils.result_cache import ResultCache
+from utils.file_sweeper import FileSweeper
+from utils.json_provider import OrjsonProvider
+from utils.process_pool import subfile_pool, WORKER_MP_CONTEXT
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -23,11 +31,27 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+app.json = OrjsonProvider(app)
 
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
+app.config['RESULT_CACHE_MAX_BYTES'] = 500 * 1024 * 1024  # 500MB of cached CSV output
+app.config['FILE_MAX_AGE'] = 60 * 60  # Uploads and outputs expire after an hour
+app.config['SWEEP_INTERVAL'] = 5 * 60
+
+# Let the front proxy send downloads: X-Sendfile (Apache mod_xsendfile) or
+# X-Accel-Redirect to an nginx `internal` location that maps to OUTPUT_FOLDER
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '')
+
+# DOCX files at least this large have their tables split across processes
+DOCX_PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+
+# CSV output is streamed to disk through a buffer this large, so big tables are written
+# in a few large chunks without holding the whole CSV in memory
+CSV_WRITE_BUFFER_BYTES = 1024 * 1024
 
 # Ensure directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -39,6 +63,105 @@ pdf_extractor = PdfExtractor()
 image_extractor = ImageExtractor()
 data_processor = DataProcessor()
 file_validator = FileValidator()
+result_cache = ResultCache(app.config['OUTPUT_FOLDER'], app.config['RESULT_CACHE_MAX_BYTES'])
+
+def _extract_docx(filepath):
+    """Extract DOCX tables, splitting large documents across the shared sub-file pool"""
+    # Sub-file parallelism keeps idle cores busy when one large DOCX straggles
+    if subfile_pool.max_workers > 1 and os.path.getsize(filepath) >= DOCX_PARALLEL_MIN_BYTES:
+        return docx_extractor.extract_tables_parallel(filepath, subfile_pool.max_workers)
+    return docx_extractor.extract_tables(filepath)
+
+# Extension -> extraction callable, one dict lookup per upload
+EXTRACTORS = dict.fromkeys(('.png', '.jpg', '.jpeg', '.bmp', '.tiff'), image_extractor.extract_tables)
+EXTRACTORS.update({'.docx': _extract_docx, '.pdf': pdf_extractor.extract_tables})
+
+# Static health check payload, serialized once at import
+_STATUS_BODY = {
+    'status': 'operational',
+    'version': '1.0.0',
+    'supported_formats': ['.docx', '.pdf', '.png', '.jpg', '.jpeg', '.bmp', '.tiff'],
+    'max_file_size': '50MB',
+    'features': [
+        'table_extraction',
+        'ocr_processing',
+        'batch_conversion',
+        'quality_metrics',
+        'data_validation'
+    ]
+}
+_STATUS_JSON = app.json.response(_STATUS_BODY).get_data()
+
+# Deletes temp files off the request path and expires anything left behind by crashed requests.
+# Its thread starts on the first discard() in each process, forked server workers included.
+file_sweeper = FileSweeper(
+    [app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER']],
+    max_age=app.config['FILE_MAX_AGE'],
+    interval=app.config['SWEEP_INTERVAL']
+)
+
+class _HashingUpload:
+    """Upload target that hashes bytes as the form parser writes them to disk"""
+
+    def __init__(self, file):
+        self._file = file
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+class UploadRequest(Request):
+    """Request that streams multipart file parts straight into the upload folder"""
+
+    @cached_property
+    def upload_streams(self):
+        return []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Keep a supported extension on the temp file; some PDF backends check it
+        extension = os.path.splitext(filename or '')[1].lower()
+        if extension not in file_validator.allowed_extensions:
+            extension = ''
+
+        upload = _HashingUpload(tempfile.NamedTemporaryFile(
+            dir=app.config['UPLOAD_FOLDER'], suffix=extension, delete=False
+        ))
+        self.upload_streams.append(upload)
+        return upload
+
+app.request_class = UploadRequest
+
+def _claim_upload(file):
+    """Flush a streamed upload to disk and return its path and SHA-256 hex digest"""
+    file.stream.flush()
+    return file.stream.name, file.stream.digest.hexdigest()
+
+def _write_csv(filepath, tables, original_filename):
+    """Convert extracted tables and stream the CSV to filepath as UTF-8"""
+    # Write beside the final path and rename, so the result cache and concurrent downloads
+    # never see a partial CSV
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filepath),
+                                     prefix=f"{os.path.basename(filepath)}.", suffix='.part')
+    try:
+        with open(fd, 'w', encoding='utf-8', newline='', buffering=CSV_WRITE_BUFFER_BYTES) as out_file:
+            csv_result = data_processor.write_csv(tables, original_filename, out_file)
+        if csv_result.get('success'):
+            os.replace(temp_path, filepath)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return csv_result
+
+@app.teardown_request
+def _remove_uploads(exc):
+    """Hand the temporary files written while parsing the request to the sweeper"""
+    for upload in request.upload_streams:
+        upload.close()
+        file_sweeper.discard(upload.name)
 
 @app.route('/')
 def index():
@@ -82,25 +205,38 @@ def convert_file():
                 'message': validation_result['message']
             }), 400
 
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
+        # The upload was streamed to disk and fingerprinted while parsing
         original_filename = secure_filename(file.filename)
         file_extension = validation_result['extension']
-        temp_filename = f"{file_id}{file_extension}"
-        temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
-
-        # Save uploaded file
-        file.save(temp_filepath)
+        temp_filepath, file_id = _claim_upload(file)
         logger.info(f"File saved: {temp_filepath}")
 
+        # Identical uploads reuse the CSV from an earlier conversion
+        cached = result_cache.get(file_id)
+        if cached:
+            logger.info(f"Serving cached conversion for {file_id}")
+            return jsonify({
+                'success': True,
+                'message': 'File converted successfully',
+                'file_id': file_id,
+                'original_filename': original_filename,
+                'download_url': f'/api/download/{file_id}',
+                'conversion_stats': cached['conversion_stats'],
+                'quality_metrics': cached['quality_metrics'],
+                'warnings': cached['warnings'],
+                'cached': True
+            }), 200
+
         # Extract data based on file type
-        extraction_result = None
-        if file_extension == '.docx':
-            extraction_result = docx_extractor.extract_tables(temp_filepath)
-        elif file_extension == '.pdf':
-            extraction_result = pdf_extractor.extract_tables(temp_filepath)
-        elif file_extension in ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']:
-            extraction_result = image_extractor.extract_tables(temp_filepath)
+        extract = EXTRACTORS.get(file_extension)
+        if extract is None:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file',
+                'message': f'Unsupported file format: {file_extension}'
+            }), 400
+
+        extraction_result = extract(temp_filepath)
 
         if not extraction_result or not extraction_result.get('success'):
             return jsonify({
@@ -110,8 +246,9 @@ def convert_file():
                 'details': extraction_result.get('details', {})
             }), 500
 
-        # Process and convert to CSV
-        csv_result = data_processor.convert_to_csv(
+        # Process and convert to CSV, written straight to the output file
+        csv_result = _write_csv(
+            result_cache.csv_path(file_id),
             extraction_result['tables'],
             original_filename
         )
@@ -124,35 +261,32 @@ def convert_file():
                 'details': csv_result.get('details', {})
             }), 500
 
-        # Save CSV file
-        output_filename = f"{file_id}_converted.csv"
-        output_filepath = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        
-        with open(output_filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            csvfile.write(csv_result['csv_content'])
+        # Prepare response
+        conversion_stats = {
+            'tables_found': extraction_result.get('table_count', 0),
+            'total_rows': csv_result.get('row_count', 0),
+            'total_columns': csv_result.get('column_count', 0),
+            'accuracy_score': extraction_result.get('accuracy_score', 0.0),
+            'processing_time': extraction_result.get('processing_time', 0.0)
+        }
+        quality_metrics = extraction_result.get('quality_metrics', {})
+        warnings = extraction_result.get('warnings', [])
 
-        # Clean up temporary file
-        try:
-            os.remove(temp_filepath)
-        except Exception as e:
-            logger.warning(f"Failed to remove temp file: {e}")
+        result_cache.put(file_id, {
+            'conversion_stats': conversion_stats,
+            'quality_metrics': quality_metrics,
+            'warnings': warnings
+        })
 
-        # Prepare response
         response_data = {
             'success': True,
             'message': 'File converted successfully',
             'file_id': file_id,
             'original_filename': original_filename,
             'download_url': f'/api/download/{file_id}',
-            'conversion_stats': {
-                'tables_found': extraction_result.get('table_count', 0),
-                'total_rows': csv_result.get('row_count', 0),
-                'total_columns': csv_result.get('column_count', 0),
-                'accuracy_score': extraction_result.get('accuracy_score', 0.0),
-                'processing_time': extraction_result.get('processing_time', 0.0)
-            },
-            'quality_metrics': extraction_result.get('quality_metrics', {}),
-            'warnings': extraction_result.get('warnings', [])
+            'conversion_stats': conversion_stats,
+            'quality_metrics': quality_metrics,
+            'warnings': warnings
         }
 
         return jsonify(response_data), 200
@@ -181,10 +315,19 @@ def download_file(file_id):
                 'message': 'The requested file does not exist or has expired'
             }), 404
 
+        download_name = f"converted_{file_id}.csv"
+        accel_prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+        if accel_prefix:
+            # nginx streams the file itself; no bytes pass through this process
+            response = Response(mimetype='text/csv')
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{output_filename}"
+            response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+            return response
+
         return send_file(
             output_filepath,
             as_attachment=True,
-            download_name=f"converted_{file_id}.csv",
+            download_name=download_name,
             mimetype='text/csv'
         )
 
@@ -196,6 +339,80 @@ def download_file(file_id):
             'message': 'Failed to download file'
         }), 500
 
+def _init_batch_worker():
+    """Batch workers already keep every core busy; threaded OpenCV filters, parallel region
+    OCR or sub-file process pools inside them would oversubscribe the cores"""
+    cv2.setNumThreads(1)
+    extractors.image_extractor.OCR_REGION_WORKERS = 1
+    subfile_pool.set_max_workers(1)
+
+def _process_one(filepath, file_extension, original_filename, file_id):
+    """
+    Extract tables from a saved upload and write its CSV
+    Runs in a worker process, so it only takes picklable arguments
+    """
+    try:
+        extract = EXTRACTORS.get(file_extension)
+        if extract is None:
+            return {
+                'filename': original_filename,
+                'success': False,
+                'error': f'Unsupported file format: {file_extension}'
+            }
+
+        extraction_result = extract(filepath)
+
+        if not extraction_result or not extraction_result.get('success'):
+            return {
+                'filename': original_filename,
+                'success': False,
+                'error': 'Data extraction failed'
+            }
+
+        csv_result = _write_csv(
+            result_cache.csv_path(file_id),
+            extraction_result['tables'],
+            original_filename
+        )
+
+        if not csv_result.get('success'):
+            return {
+                'filename': original_filename,
+                'success': False,
+                'error': 'CSV conversion failed'
+            }
+
+        result_cache.put(file_id, {
+            'conversion_stats': {
+                'tables_found': extraction_result.get('table_count', 0),
+                'total_rows': csv_result.get('row_count', 0),
+                'total_columns': csv_result.get('column_count', 0),
+                'accuracy_score': extraction_result.get('accuracy_score', 0.0),
+                'processing_time': extraction_result.get('processing_time', 0.0)
+            },
+            'quality_metrics': extraction_result.get('quality_metrics', {}),
+            'warnings': extraction_result.get('warnings', [])
+        })
+
+        return {
+            'filename': original_filename,
+            'success': True,
+            'file_id': file_id,
+            'download_url': f'/api/download/{file_id}',
+            'stats': {
+                'tables_found': extraction_result.get('table_count', 0),
+                'total_rows': csv_result.get('row_count', 0)
+            }
+        }
+
+    except Exception as e:
+        logger.error(f"Batch conversion error for {original_filename}: {str(e)}")
+        return {
+            'filename': original_filename,
+            'success': False,
+            'error': 'Processing failed'
+        }
+
 @app.route('/api/batch-convert', methods=['POST'])
 def batch_convert():
     """
@@ -210,9 +427,13 @@ def batch_convert():
                 'message': 'Please select files to upload'
             }), 400
 
-        results = []
-        batch_id = str(uuid.uuid4())
+        results = {}
+        jobs = []
+        job_indexes = {}
+        duplicates = []
+        batch_id = secrets.token_hex(16)
         
+        # Validate and check the cache serially; only real work goes to the pool
         for i, file in enumerate(files):
             if file.filename == '':
                 continue
@@ -221,81 +442,77 @@ def batch_convert():
                 # Validate file
                 validation_result = file_validator.validate_file(file)
                 if not validation_result['valid']:
-                    results.append({
+                    results[i] = {
                         'filename': file.filename,
                         'success': False,
                         'error': validation_result['message']
-                    })
+                    }
                     continue
 
-                # Process individual file (similar to single file conversion)
-                file_id = f"{batch_id}_{i}"
                 original_filename = secure_filename(file.filename)
                 file_extension = validation_result['extension']
-                temp_filename = f"{file_id}{file_extension}"
-                temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
-
-                file.save(temp_filepath)
-
-                # Extract and convert
-                extraction_result = None
-                if file_extension == '.docx':
-                    extraction_result = docx_extractor.extract_tables(temp_filepath)
-                elif file_extension == '.pdf':
-                    extraction_result = pdf_extractor.extract_tables(temp_filepath)
-                elif file_extension in ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']:
-                    extraction_result = image_extractor.extract_tables(temp_filepath)
-
-                if extraction_result and extraction_result.get('success'):
-                    csv_result = data_processor.convert_to_csv(
-                        extraction_result['tables'],
-                        original_filename
-                    )
-                    
-                    if csv_result.get('success'):
-                        output_filename = f"{file_id}_converted.csv"
-                        output_filepath = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-                        
-                        with open(output_filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                            csvfile.write(csv_result['csv_content'])
-
-                        results.append({
-                            'filename': original_filename,
-                            'success': True,
-                            'file_id': file_id,
-                            'download_url': f'/api/download/{file_id}',
-                            'stats': {
-                                'tables_found': extraction_result.get('table_count', 0),
-                                'total_rows': csv_result.get('row_count', 0)
-                            }
-                        })
-                    else:
-                        results.append({
-                            'filename': original_filename,
-                            'success': False,
-                            'error': 'CSV conversion failed'
-                        })
-                else:
-                    results.append({
+                temp_filepath, file_id = _claim_upload(file)
+
+                cached = result_cache.get(file_id)
+                if cached:
+                    results[i] = {
                         'filename': original_filename,
-                        'success': False,
-                        'error': 'Data extraction failed'
-                    })
+                        'success': True,
+                        'file_id': file_id,
+                        'download_url': f'/api/download/{file_id}',
+                        'stats': {
+                            'tables_found': cached['conversion_stats']['tables_found'],
+                            'total_rows': cached['conversion_stats']['total_rows']
+                        },
+                        'cached': True
+                    }
+                    continue
 
-                # Clean up
-                try:
-                    os.remove(temp_filepath)
-                except:
-                    pass
+                # Identical uploads in one batch share a single conversion
+                if file_id in job_indexes:
+                    duplicates.append((i, job_indexes[file_id], original_filename))
+                    continue
+
+                job_indexes[file_id] = i
+                jobs.append((i, temp_filepath, file_extension, original_filename, file_id))
 
             except Exception as e:
                 logger.error(f"Batch conversion error for {file.filename}: {str(e)}")
-                results.append({
+                results[i] = {
                     'filename': file.filename,
                     'success': False,
                     'error': 'Processing failed'
-                })
+                }
+
+        if len(jobs) == 1:
+            i, *args = jobs[0]
+            results[i] = _process_one(*args)
+        elif jobs:
+            # Largest files first so a big document does not start last and straggle
+            jobs.sort(key=lambda job: os.path.getsize(job[1]), reverse=True)
+
+            workers = min(len(jobs), os.cpu_count() or 1)
+            # Never fork the threaded web process: a lock held by another request thread
+            # at fork time would stay locked forever in the child
+            with ProcessPoolExecutor(max_workers=workers, mp_context=WORKER_MP_CONTEXT,
+                                     initializer=_init_batch_worker) as executor:
+                futures = {executor.submit(_process_one, *args): i for i, *args in jobs}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        logger.error(f"Batch worker failed for {files[i].filename}: {str(e)}")
+                        results[i] = {
+                            'filename': files[i].filename,
+                            'success': False,
+                            'error': 'Processing failed'
+                        }
+
+        for i, job_index, original_filename in duplicates:
+            results[i] = {**results[job_index], 'filename': original_filename}
 
+        results = [results[i] for i in sorted(results)]
         successful_conversions = sum(1 for r in results if r['success'])
         
         return jsonify({
@@ -318,43 +535,37 @@ def batch_convert():
 @app.route('/api/status')
 def api_status():
     """API health check endpoint"""
-    return jsonify({
-        'status': 'operational',
-        'version': '1.0.0',
-        'supported_formats': ['.docx', '.pdf', '.png', '.jpg', '.jpeg', '.bmp', '.tiff'],
-        'max_file_size': '50MB',
-        'features': [
-            'table_extraction',
-            'ocr_processing',
-            'batch_conversion',
-            'quality_metrics',
-            'data_validation'
-        ]
-    })
+    # A fresh Response per call; after_request hooks may mutate headers
+    return Response(_STATUS_JSON, mimetype='application/json')
+
+# Error bodies never change, so they are serialized once at import
+_TOO_LARGE_JSON = app.json.response({
+    'success': False,
+    'error': 'File too large',
+    'message': 'File size exceeds the maximum limit of 50MB'
+}).get_data()
+_NOT_FOUND_JSON = app.json.response({
+    'success': False,
+    'error': 'Not found',
+    'message': 'The requested resource was not found'
+}).get_data()
+_INTERNAL_ERROR_JSON = app.json.response({
+    'success': False,
+    'error': 'Internal server error',
+    'message': 'An unexpected error occurred'
+}).get_data()
 
 @app.errorhandler(413)
 def too_large(e):
-    return jsonify({
-        'success': False,
-        'error': 'File too large',
-        'message': 'File size exceeds the maximum limit of 50MB'
-    }), 413
+    return Response(_TOO_LARGE_JSON, status=413, mimetype='application/json')
 
 @app.errorhandler(404)
 def not_found(e):
-    return jsonify({
-        'success': False,
-        'error': 'Not found',
-        'message': 'The requested resource was not found'
-    }), 404
+    return Response(_NOT_FOUND_JSON, status=404, mimetype='application/json')
 
 @app.errorhandler(500)
 def internal_error(e):
-    return jsonify({
-        'success': False,
-        'error': 'Internal server error',
-        'message': 'An unexpected error occurred'
-    }), 500
+    return Response(_INTERNAL_ERROR_JSON, status=500, mimetype='application/json')
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -2,8 +2,21 @@
 File extractors package for document and image processing
 """
 
-from .docx_extractor import DocxExtractor
-from .pdf_extractor import PdfExtractor
-from .image_extractor import ImageExtractor
+import importlib
 
-__all__ = ['DocxExtractor', 'PdfExtractor', 'ImageExtractor']
+# Extractors are imported on first access, so importing one submodule (e.g. in a
+# sub-file pool worker) does not load every other backend's dependencies
+_EXPORTS = {
+    'DocxExtractor': 'docx_extractor',
+    'PdfExtractor': 'pdf_extractor',
+    'ImageExtractor': 'image_extractor',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
@@ -1,12 +1,53 @@
 import logging
+import math
 import time
+from itertools import chain
+import numpy as np
 from docx import Document
+from docx.oxml.ns import nsmap, qn
 from docx.table import Table
-import pandas as pd
+from lxml import etree
 from typing import List, Dict, Any, Optional
 
+from utils.process_pool import subfile_pool
+
 logger = logging.getLogger(__name__)
 
+_NSMAP = {'w': nsmap['w']}
+
+# Compiled once; lxml evaluates these in C instead of python-docx's per-attribute proxies
+_TR_XPATH = etree.XPath('./w:tr', namespaces=_NSMAP)
+_TC_XPATH = etree.XPath('./w:tc', namespaces=_NSMAP)
+
+# Number of grid columns skipped before a row's first cell, as a string ('' if absent)
+_GRID_BEFORE_XPATH = etree.XPath('string(./w:trPr/w:gridBefore/@w:val)', namespaces=_NSMAP)
+
+# Everything needed from a cell in one call, in document order: its merge properties,
+# then the text-bearing run content of its paragraphs. The paragraphs themselves are
+# included as separators, mirroring python-docx's cell.text. Element.find() goes
+# through lxml's Python-level ElementPath, so one XPath per cell beats several finds.
+_CELL_XPATH = etree.XPath(
+    './w:tcPr/w:gridSpan | ./w:tcPr/w:vMerge | ./w:p'
+    ' | (./w:p/w:r | ./w:p/w:hyperlink/w:r)/*[self::w:t or self::w:tab or self::w:ptab'
+    ' or self::w:cr or self::w:noBreakHyphen'
+    ' or self::w:br[not(@w:type) or @w:type = "textWrapping"]]',
+    namespaces=_NSMAP
+)
+
+_W_T = qn('w:t')
+_W_NO_BREAK_HYPHEN = qn('w:noBreakHyphen')
+_W_GRID_SPAN = qn('w:gridSpan')
+_W_V_MERGE = qn('w:vMerge')
+_W_VAL = qn('w:val')
+
+def _extract_table_range(args):
+    """Extract tables [start, stop) of a DOCX file; runs in a worker process"""
+    file_path, start, stop = args
+    extractor = DocxExtractor()
+    # Each worker parses the file itself; parsed documents can't be sent between processes
+    tables = Document(file_path).tables
+    return [extractor._extract_single_table(tables[i], i) for i in range(start, stop)]
+
 class DocxExtractor:
     """Extract tables and data from DOCX files"""
     
@@ -31,46 +72,50 @@ class DocxExtractor:
             # Open document
             doc = Document(file_path)
             
-            # Extract tables
-            tables_data = []
-            warnings = []
-            
-            for i, table in enumerate(doc.tables):
-                try:
-                    table_data = self._extract_single_table(table, i)
-                    if table_data and len(table_data) > 0:
-                        tables_data.append({
-                            'table_index': i,
-                            'data': table_data,
-                            'rows': len(table_data),
-                            'columns': len(table_data[0]) if table_data else 0
-                        })
-                        logger.info(f"Extracted table {i}: {len(table_data)} rows x {len(table_data[0]) if table_data else 0} columns")
-                    else:
-                        warnings.append(f"Table {i} appears to be empty or malformed")
-                        
-                except Exception as e:
-                    logger.error(f"Error extracting table {i}: {str(e)}")
-                    warnings.append(f"Failed to extract table {i}: {str(e)}")
-            
-            processing_time = time.time() - start_time
-            
-            # Calculate quality metrics
-            quality_metrics = self._calculate_quality_metrics(tables_data)
-            
-            result = {
-                'success': True,
-                'tables': tables_data,
-                'table_count': len(tables_data),
-                'processing_time': processing_time,
-                'accuracy_score': quality_metrics['accuracy_score'],
-                'quality_metrics': quality_metrics,
-                'warnings': warnings,
-                'extraction_method': 'docx_native'
+            table_results = [self._extract_single_table(table, i) for i, table in enumerate(doc.tables)]
+            return self._build_result(table_results, start_time)
+            
+        except Exception as e:
+            logger.error(f"DOCX extraction failed: {str(e)}")
+            return {
+                'success': False,
+                'message': f'Failed to extract data from DOCX file: {str(e)}',
+                'details': {'error_type': type(e).__name__, 'file_path': file_path}
             }
+    
+    def extract_tables_parallel(self, file_path: str, workers: int) -> Dict[str, Any]:
+        """
+        Extract all tables from a DOCX file, spreading tables across processes
+        
+        Args:
+            file_path: Path to the DOCX file
+            workers: Number of table ranges to split the document into; they run on the
+                shared sub-file pool
             
-            logger.info(f"DOCX extraction completed: {len(tables_data)} tables in {processing_time:.2f}s")
-            return result
+        Returns:
+            Dictionary containing extraction results
+        """
+        start_time = time.time()
+        
+        try:
+            logger.info(f"Starting parallel DOCX extraction for: {file_path}")
+            
+            doc = Document(file_path)
+            table_count = len(doc.tables)
+            
+            if workers <= 1 or table_count < 2:
+                table_results = [self._extract_single_table(table, i) for i, table in enumerate(doc.tables)]
+                return self._build_result(table_results, start_time)
+            
+            # One contiguous slice of tables per worker, so each worker parses the file once
+            chunk_size = math.ceil(table_count / workers)
+            ranges = [(file_path, start, min(start + chunk_size, table_count))
+                      for start in range(0, table_count, chunk_size)]
+            
+            # The shared pool caps processes across concurrent requests
+            table_results = list(chain.from_iterable(subfile_pool.map(_extract_table_range, ranges)))
+            
+            return self._build_result(table_results, start_time)
             
         except Exception as e:
             logger.error(f"DOCX extraction failed: {str(e)}")
@@ -80,6 +125,57 @@ class DocxExtractor:
                 'details': {'error_type': type(e).__name__, 'file_path': file_path}
             }
     
+    def _build_result(self, table_results: List[List[List[str]]], start_time: float) -> Dict[str, Any]:
+        """
+        Assemble the extraction result from per-table data
+        
+        Args:
+            table_results: Extracted data for each table, in document order
+            start_time: Time the extraction started
+            
+        Returns:
+            Dictionary containing extraction results
+        """
+        # Keep non-empty tables
+        tables_data = []
+        warnings = []
+        
+        for i, table_data in enumerate(table_results):
+            try:
+                if table_data and len(table_data) > 0:
+                    tables_data.append({
+                        'table_index': i,
+                        'data': table_data,
+                        'rows': len(table_data),
+                        'columns': len(table_data[0]) if table_data else 0
+                    })
+                    logger.info(f"Extracted table {i}: {len(table_data)} rows x {len(table_data[0]) if table_data else 0} columns")
+                else:
+                    warnings.append(f"Table {i} appears to be empty or malformed")
+                    
+            except Exception as e:
+                logger.error(f"Error extracting table {i}: {str(e)}")
+                warnings.append(f"Failed to extract table {i}: {str(e)}")
+        
+        processing_time = time.time() - start_time
+        
+        # Calculate quality metrics
+        quality_metrics = self._calculate_quality_metrics(tables_data)
+        
+        result = {
+            'success': True,
+            'tables': tables_data,
+            'table_count': len(tables_data),
+            'processing_time': processing_time,
+            'accuracy_score': quality_metrics['accuracy_score'],
+            'quality_metrics': quality_metrics,
+            'warnings': warnings,
+            'extraction_method': 'docx_native'
+        }
+        
+        logger.info(f"DOCX extraction completed: {len(tables_data)} tables in {processing_time:.2f}s")
+        return result
+    
     def _extract_single_table(self, table: Table, table_index: int) -> List[List[str]]:
         """
         Extract data from a single table
@@ -93,31 +189,61 @@ class DocxExtractor:
         """
         try:
             table_data = []
+            above = {}  # grid offset -> (text, span) of the previous row's cells
             
-            for row_idx, row in enumerate(table.rows):
+            for tr in _TR_XPATH(table._tbl):
                 row_data = []
+                current = {}
+                has_text = False
                 
-                for cell_idx, cell in enumerate(row.cells):
-                    # Clean cell text
-                    cell_text = cell.text.strip()
+                # Rows may start later than the first grid column
+                grid_before = _GRID_BEFORE_XPATH(tr)
+                offset = int(grid_before) if grid_before else 0
+                
+                for tc in _TC_XPATH(tr):
+                    span = 1
+                    v_merge = None
+                    parts = []
+                    for node in _CELL_XPATH(tc):
+                        tag = node.tag
+                        if tag == _W_T:
+                            parts.append(node.text or '')
+                        elif tag == _W_GRID_SPAN:
+                            span = int(node.get(_W_VAL, 1))
+                        elif tag == _W_V_MERGE:
+                            v_merge = node.get(_W_VAL, 'continue')
+                        elif tag == _W_NO_BREAK_HYPHEN:
+                            parts.append('-')
+                        else:
+                            parts.append(' ')
                     
-                    # Handle merged cells by checking if this cell spans multiple columns
-                    if hasattr(cell, '_element'):
-                        # Check for merged cells and handle accordingly
-                        cell_text = self._clean_cell_text(cell_text)
+                    if v_merge == 'continue':
+                        # Vertically merged continuation repeats the cell above
+                        cell_text, repeat = above[offset]
+                    else:
+                        # _clean_cell_text strips as it collapses whitespace
+                        cell_text = self._clean_cell_text(''.join(parts)) if parts else ''
+                        repeat = span
                     
-                    row_data.append(cell_text)
+                    # Horizontally merged cells repeat once per spanned grid column
+                    row_data.extend([cell_text] * repeat)
+                    has_text = has_text or bool(cell_text)
+                    current[offset] = (cell_text, repeat)
+                    offset += span
+                
+                above = current
                 
-                # Only add non-empty rows
-                if any(cell.strip() for cell in row_data):
+                # Only add non-empty rows; cleaned text is already stripped
+                if has_text:
                     table_data.append(row_data)
             
             # Normalize table structure (ensure all rows have same number of columns)
             if table_data:
-                max_cols = max(len(row) for row in table_data)
-                for row in table_data:
-                    while len(row) < max_cols:
-                        row.append('')
+                max_cols = max(map(len, table_data))
+                # Rectangular tables are the common case and need no padding
+                if min(map(len, table_data)) < max_cols:
+                    for row in table_data:
+                        row.extend([''] * (max_cols - len(row)))
             
             return table_data
             
@@ -138,14 +264,10 @@ class DocxExtractor:
         if not text:
             return ''
         
-        # Remove extra whitespace and normalize
-        text = ' '.join(text.split())
-        
-        # Remove common unwanted characters but preserve numbers and punctuation
-        text = text.replace('\x0b', ' ')  # Vertical tab
-        text = text.replace('\x0c', ' ')  # Form feed
-        
-        return text.strip()
+        # str.split() treats every whitespace character (tabs, newlines, vertical
+        # tab, form feed, NBSP, ...) as a separator, so one C-level pass both
+        # normalizes and collapses whitespace and leaves nothing to strip
+        return ' '.join(text.split())
     
     def _calculate_quality_metrics(self, tables_data: List[Dict]) -> Dict[str, Any]:
         """
@@ -176,18 +298,16 @@ class DocxExtractor:
                 continue
                 
             # Count cells and empty cells
-            for row in table_data:
-                total_cells += len(row)
-                empty_cells += sum(1 for cell in row if not cell.strip())
+            row_lengths = np.fromiter(map(len, table_data), dtype=np.int64, count=len(table_data))
+            table_cells = int(row_lengths.sum())
+            total_cells += table_cells
+            empty_cells += table_cells - sum(map(bool, map(str.strip, chain.from_iterable(table_data))))
             
-            # Check column consistency
-            if table_data:
-                expected_cols = len(table_data[0])
-                for i, row in enumerate(table_data[1:], 1):
-                    if len(row) != expected_cols:
-                        inconsistent_columns += 1
-                        if len(data_quality_issues) < 5:  # Limit number of issues reported
-                            data_quality_issues.append(f"Table {table['table_index']} row {i}: inconsistent column count")
+            # Check column consistency against the first row
+            inconsistent_rows = np.flatnonzero(row_lengths != row_lengths[0])
+            inconsistent_columns += len(inconsistent_rows)
+            for i in inconsistent_rows[:max(0, 5 - len(data_quality_issues))]:  # Limit number of issues reported
+                data_quality_issues.append(f"Table {table['table_index']} row {i}: inconsistent column count")
         
         # Calculate metrics
         completeness = (total_cells - empty_cells) / total_cells if total_cells > 0 else 0.0
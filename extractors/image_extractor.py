@@ -3,19 +3,181 @@ import time
 import cv2
 import numpy as np
 import pytesseract
-from PIL import Image
-import pandas as pd
 from typing import List, Dict, Any, Optional
 import re
 import os
+import queue
+import shlex
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+
+from utils.ocr_cache import OcrCache
 
 logger = logging.getLogger(__name__)
 
+# Regions are OCR'd concurrently, by tesseract processes or pooled tesserocr handles;
+# OpenMP threads inside each one would only oversubscribe the cores
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# Optional in-process Tesseract bindings; they skip the per-call subprocess and model load.
+# Opt in with OCR_BACKEND=tesserocr, otherwise the pytesseract CLI path is used. Imported
+# after OMP_THREAD_LIMIT is set so libtesseract's OpenMP runtime sees it.
+OCR_BACKEND = os.environ.get('OCR_BACKEND', 'pytesseract').lower()
+tesserocr = None
+if OCR_BACKEND == 'tesserocr':
+    try:
+        import tesserocr
+    except ImportError:
+        logger.warning("OCR_BACKEND=tesserocr but tesserocr is not installed, using pytesseract")
+
+# Let OpenCV's parallel_for_ split each filter across every core. Batch workers, which
+# already run one file per core, drop this back to one thread in each process.
+cv2.setNumThreads(os.cpu_count() or 1)
+
+# Table regions OCR'd at once, each by its own tesseract process or tesserocr handle.
+# Batch workers, which already run one file per core, set this to 1.
+OCR_REGION_WORKERS = os.cpu_count() or 1
+
+# Tesseract works best around 20-40px glyphs; regions whose median glyph height is
+# above the max are downscaled to the target before OCR
+OCR_MAX_CHAR_HEIGHT = 40
+OCR_TARGET_CHAR_HEIGHT = 32
+
+# OCR output is reused across runs until the Tesseract install changes
+OCR_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'dataconverterpro', 'ocr')
+
+# Images handed to the tesseract CLI go through RAM-backed /dev/shm where available,
+# so the handoff never touches the disk; otherwise the default temp dir is used
+OCR_TEMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+
+@lru_cache(maxsize=1)
+def _tesseract_version() -> str:
+    if tesserocr is not None:
+        return tesserocr.tesseract_version()
+    return str(pytesseract.get_tesseract_version())
+
+# Idle tesserocr API handles. Each one holds a loaded model, so they are pooled and
+# reused across calls and threads instead of being created per region.
+_idle_tess_apis = queue.SimpleQueue()
+
+@contextmanager
+def _tess_api(config: str):
+    """
+    Borrow a tesserocr API configured from a tesseract command-line config string
+    
+    Understands the --oem, --psm and -c name=value options used by the extractor.
+    """
+    try:
+        api = _idle_tess_apis.get_nowait()
+    except queue.Empty:
+        api = tesserocr.PyTessBaseAPI(oem=tesserocr.OEM.DEFAULT)
+    
+    try:
+        # Reset state a previous borrower may have changed
+        api.SetPageSegMode(tesserocr.PSM.AUTO)
+        api.SetVariable('tessedit_char_whitelist', '')
+        
+        args = shlex.split(config)
+        for i, arg in enumerate(args):
+            if arg == '--psm':
+                api.SetPageSegMode(int(args[i + 1]))
+            elif arg == '-c':
+                name, _, value = args[i + 1].partition('=')
+                api.SetVariable(name, value)
+        
+        yield api
+    finally:
+        api.Clear()
+        _idle_tess_apis.put(api)
+
+def _set_tess_image(api, image: np.ndarray) -> None:
+    """Hand an 8-bit grayscale or BGR image to tesserocr without going through PIL"""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+    api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, image.strides[0])
+
+def _tesserocr_image_to_data(image: np.ndarray, config: str) -> Dict[str, List]:
+    """Word boxes in pytesseract.image_to_data's dict layout, for the columns the extractor reads"""
+    ocr_data = {'text': [], 'conf': [], 'left': [], 'top': [], 'width': [], 'height': []}
+    
+    with _tess_api(config) as api:
+        _set_tess_image(api, image)
+        api.Recognize()
+        iterator = api.GetIterator()
+        if iterator is None:
+            return ocr_data
+        
+        level = tesserocr.RIL.WORD
+        for word in tesserocr.iterate_level(iterator, level):
+            box = word.BoundingBox(level)
+            if box is None:
+                continue
+            left, top, right, bottom = box
+            ocr_data['text'].append(word.GetUTF8Text(level) or '')
+            ocr_data['conf'].append(word.Confidence(level))
+            ocr_data['left'].append(left)
+            ocr_data['top'].append(top)
+            ocr_data['width'].append(right - left)
+            ocr_data['height'].append(bottom - top)
+    
+    return ocr_data
+
+def _tesserocr_image_to_string(image: np.ndarray, config: str) -> str:
+    with _tess_api(config) as api:
+        _set_tess_image(api, image)
+        return api.GetUTF8Text()
+
+def _write_ocr_input(image: np.ndarray, suffix: str, temp_dir: Optional[str]) -> Optional[str]:
+    """Write image to a new temp file in temp_dir; returns its path, or None on failure"""
+    try:
+        with tempfile.NamedTemporaryFile(prefix='ocr_', suffix=suffix, dir=temp_dir, delete=False) as f:
+            path = f.name
+    except OSError:
+        return None
+    
+    try:
+        written = cv2.imwrite(path, image)
+    except cv2.error:
+        written = False
+    if not written:
+        os.remove(path)
+        return None
+    return path
+
+@contextmanager
+def _ocr_input_file(image: np.ndarray):
+    """
+    Write an image as an uncompressed PGM/PPM file for tesseract to read
+    
+    Given an ndarray, pytesseract converts it to a PIL image and PNG-encodes it to
+    a temp file; given a path it hands the file straight to tesseract. PNM needs no
+    compression, so writing it is little more than a memcpy, and OCR_TEMP_DIR keeps
+    that copy in memory.
+    """
+    suffix = '.pgm' if image.ndim == 2 else '.ppm'
+    path = _write_ocr_input(image, suffix, OCR_TEMP_DIR)
+    if path is None and OCR_TEMP_DIR is not None:
+        # /dev/shm is small on many hosts (64MB in Docker); fall back to the disk tempdir
+        logger.warning(f"Could not write OCR input to {OCR_TEMP_DIR}, retrying in the default temp dir")
+        path = _write_ocr_input(image, suffix, None)
+    if path is None:
+        raise ValueError("Could not write OCR input image")
+    try:
+        yield path
+    finally:
+        os.remove(path)
+
 class ImageExtractor:
     """Extract tables and data from images using OCR and computer vision"""
     
     def __init__(self):
         self.supported_extensions = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']
+        self.ocr_cache = OcrCache(OCR_CACHE_DIR)
         
         # Configure Tesseract (adjust path if needed)
         # pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
@@ -35,8 +197,13 @@ class ImageExtractor:
         try:
             logger.info(f"Starting image extraction for: {file_path}")
             
-            # Load and preprocess image
-            image = cv2.imread(file_path)
+            # Load and preprocess image. libjpeg can decode straight to luma, which matches
+            # cvtColor exactly and skips building the colour image; other decoders round
+            # differently, so they still load in colour
+            if os.path.splitext(file_path)[1].lower() in ('.jpg', '.jpeg'):
+                image = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
+            else:
+                image = cv2.imread(file_path)
             if image is None:
                 raise ValueError("Could not load image file")
             
@@ -58,18 +225,24 @@ class ImageExtractor:
                 else:
                     warnings.append("No tabular data could be extracted from image")
             else:
-                # Extract data from each detected table region
-                for i, region in enumerate(table_regions):
-                    try:
-                        table_data = self._extract_table_from_region(processed_image, region, i)
-                        if table_data:
-                            tables_data.append(table_data)
-                            logger.info(f"Extracted table {i}: {table_data['rows']} rows x {table_data['columns']} columns")
-                        else:
-                            warnings.append(f"Table region {i} produced no usable data")
-                    except Exception as e:
-                        logger.error(f"Error extracting table {i}: {str(e)}")
-                        warnings.append(f"Failed to extract table {i}: {str(e)}")
+                # Extract data from each detected table region; each region's OCR runs in its
+                # own tesseract subprocess, so threads overlap them without contending for the GIL
+                workers = min(len(table_regions), OCR_REGION_WORKERS)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(self._extract_table_from_region, processed_image, region, i)
+                               for i, region in enumerate(table_regions)]
+                    
+                    for i, future in enumerate(futures):
+                        try:
+                            table_data = future.result()
+                            if table_data:
+                                tables_data.append(table_data)
+                                logger.info(f"Extracted table {i}: {table_data['rows']} rows x {table_data['columns']} columns")
+                            else:
+                                warnings.append(f"Table region {i} produced no usable data")
+                        except Exception as e:
+                            logger.error(f"Error extracting table {i}: {str(e)}")
+                            warnings.append(f"Failed to extract table {i}: {str(e)}")
             
             processing_time = time.time() - start_time
             
@@ -103,13 +276,13 @@ class ImageExtractor:
         Preprocess image for better OCR results
         
         Args:
-            image: Original image
+            image: Original image, BGR or already grayscale
             
         Returns:
             Preprocessed image
         """
         # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # Apply noise removal
         denoised = cv2.medianBlur(gray, 3)
@@ -125,29 +298,41 @@ class ImageExtractor:
         
         return processed
     
-    def _detect_table_regions(self, image: np.ndarray) -> List[Dict[str, int]]:
+    def _detect_table_regions(self, image: np.ndarray, downscale: int = 2) -> List[Dict[str, int]]:
         """
         Detect table regions in the image using line detection
         
         Args:
             image: Preprocessed image
+            downscale: Run line detection at 1/downscale resolution; regions are
+                returned in full-resolution coordinates
             
         Returns:
             List of table region coordinates
         """
         try:
-            # Detect horizontal and vertical lines
-            horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (40, 1))
-            vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 40))
+            # Ruling lines survive a 2x nearest-neighbour reduction, and the morphology and
+            # contour passes then touch a quarter of the pixels. Nearest keeps the mask
+            # binary; area averaging would smear background noise into solid blobs.
+            if downscale > 1:
+                mask = cv2.resize(image, None, fx=1 / downscale, fy=1 / downscale, interpolation=cv2.INTER_NEAREST)
+            else:
+                mask = image
+            
+            # Detect horizontal and vertical lines, with kernels scaled to the mask
+            line_length = max(1, 40 // downscale)
+            horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (line_length, 1))
+            vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, line_length))
             
             # Detect horizontal lines
-            horizontal_lines = cv2.morphologyEx(image, cv2.MORPH_OPEN, horizontal_kernel)
+            horizontal_lines = cv2.morphologyEx(mask, cv2.MORPH_OPEN, horizontal_kernel)
             
             # Detect vertical lines
-            vertical_lines = cv2.morphologyEx(image, cv2.MORPH_OPEN, vertical_kernel)
+            vertical_lines = cv2.morphologyEx(mask, cv2.MORPH_OPEN, vertical_kernel)
             
-            # Combine lines
-            table_mask = cv2.addWeighted(horizontal_lines, 0.5, vertical_lines, 0.5, 0.0)
+            # Combine lines; findContours only cares about non-zero pixels, so a bitwise OR
+            # gives the same contours as blending without the float multiply-add
+            table_mask = cv2.bitwise_or(horizontal_lines, vertical_lines, dst=horizontal_lines)
             
             # Find contours of table regions
             contours, _ = cv2.findContours(table_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -157,9 +342,10 @@ class ImageExtractor:
             min_area = 1000  # Minimum area for a table
             
             for contour in contours:
-                area = cv2.contourArea(contour)
+                # Measure in full-resolution pixels
+                area = cv2.contourArea(contour) * downscale * downscale
                 if area > min_area:
-                    x, y, w, h = cv2.boundingRect(contour)
+                    x, y, w, h = (value * downscale for value in cv2.boundingRect(contour))
                     # Add some padding
                     padding = 10
                     table_regions.append({
@@ -200,11 +386,23 @@ class ImageExtractor:
             # Perform OCR on the region
             custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,()%$-+= '
             
-            # Get detailed OCR data
-            ocr_data = pytesseract.image_to_data(roi, config=custom_config, output_type=pytesseract.Output.DICT)
+            # Get detailed OCR data. Oversized text is shrunk first since OCR time grows
+            # with pixel count; word boxes are mapped back to ROI pixels so the row
+            # grouping tolerance keeps its meaning.
+            scale = self._ocr_scale(roi)
+            if scale < 1.0:
+                small_roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                ocr_data = dict(self._image_to_data(small_roi, custom_config))
+                for key in ('left', 'top', 'width', 'height'):
+                    ocr_data[key] = [round(value / scale) for value in ocr_data[key]]
+            else:
+                ocr_data = self._image_to_data(roi, custom_config)
+            
+            # Convert confidences once; both the word filter and the score use them
+            confidences = self._ocr_confidences(ocr_data)
             
             # Parse OCR data into table structure
-            table_data = self._parse_ocr_to_table(ocr_data, roi.shape)
+            table_data = self._parse_ocr_to_table(ocr_data, roi.shape, confidences)
             
             if table_data and len(table_data) > 0:
                 return {
@@ -213,7 +411,7 @@ class ImageExtractor:
                     'rows': len(table_data),
                     'columns': len(table_data[0]) if table_data else 0,
                     'region': region,
-                    'confidence': self._calculate_ocr_confidence(ocr_data)
+                    'confidence': self._calculate_ocr_confidence(ocr_data, confidences)
                 }
             
             return None
@@ -222,6 +420,57 @@ class ImageExtractor:
             logger.error(f"Error extracting table from region {table_index}: {str(e)}")
             return None
     
+    def _ocr_scale(self, image: np.ndarray) -> float:
+        """
+        Estimate how far a binarized region can be shrunk before OCR
+        
+        Args:
+            image: Binarized region, dark text on a light background
+            
+        Returns:
+            Scale factor bringing the median glyph height down to OCR_TARGET_CHAR_HEIGHT,
+            or 1.0 if the text is already small enough or too sparse to measure
+        """
+        _, _, stats, _ = cv2.connectedComponentsWithStats(cv2.bitwise_not(image), connectivity=8)
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        
+        # Glyph-like components: not specks, ruling lines or the table grid
+        glyphs = (heights >= 4) & (heights <= 5 * widths) & (widths <= 5 * heights) & (heights < image.shape[0] // 2)
+        if np.count_nonzero(glyphs) < 10:
+            return 1.0
+        
+        char_height = float(np.median(heights[glyphs]))
+        if char_height <= OCR_MAX_CHAR_HEIGHT:
+            return 1.0
+        return OCR_TARGET_CHAR_HEIGHT / char_height
+    
+    def _image_to_data(self, image: np.ndarray, config: str) -> Dict[str, List]:
+        """image_to_data as a dict via tesserocr or pytesseract, served from the OCR cache when possible"""
+        key = OcrCache.make_key(image, 'image_to_data', config, _tesseract_version())
+        ocr_data = self.ocr_cache.get(key)
+        if ocr_data is None:
+            if tesserocr is not None:
+                ocr_data = _tesserocr_image_to_data(image, config)
+            else:
+                with _ocr_input_file(image) as path:
+                    ocr_data = pytesseract.image_to_data(path, config=config, output_type=pytesseract.Output.DICT)
+            self.ocr_cache.put(key, ocr_data)
+        return ocr_data
+    
+    def _image_to_string(self, image: np.ndarray, config: str) -> str:
+        """image_to_string via tesserocr or pytesseract, served from the OCR cache when possible"""
+        key = OcrCache.make_key(image, 'image_to_string', config, _tesseract_version())
+        text = self.ocr_cache.get(key)
+        if text is None:
+            if tesserocr is not None:
+                text = _tesserocr_image_to_string(image, config)
+            else:
+                with _ocr_input_file(image) as path:
+                    text = pytesseract.image_to_string(path, config=config)
+            self.ocr_cache.put(key, text)
+        return text
+    
     def _extract_full_text_as_table(self, image: np.ndarray) -> Optional[Dict[str, Any]]:
         """
         Extract full image text and attempt to structure it as a table
@@ -235,7 +484,7 @@ class ImageExtractor:
         try:
             # Perform OCR on entire image
             custom_config = r'--oem 3 --psm 6'
-            text = pytesseract.image_to_string(image, config=custom_config)
+            text = self._image_to_string(image, custom_config)
             
             if not text.strip():
                 return None
@@ -274,74 +523,69 @@ class ImageExtractor:
             logger.error(f"Full text extraction failed: {str(e)}")
             return None
     
-    def _parse_ocr_to_table(self, ocr_data: Dict, image_shape: tuple) -> List[List[str]]:
+    def _ocr_confidences(self, ocr_data: Dict) -> np.ndarray:
+        """Word confidences as integers, truncated like int() so float confs behave as before"""
+        return np.asarray(ocr_data['conf'], dtype=np.float64).astype(np.int64)
+    
+    def _parse_ocr_to_table(self, ocr_data: Dict, image_shape: tuple,
+                            confidences: Optional[np.ndarray] = None) -> List[List[str]]:
         """
         Parse OCR data into table structure based on word positions
         
         Args:
             ocr_data: OCR data from pytesseract
             image_shape: Shape of the processed image
+            confidences: Precomputed _ocr_confidences(ocr_data), if available
             
         Returns:
             Table data as list of lists
         """
         try:
-            # Extract words with positions and confidence
-            words = []
-            for i in range(len(ocr_data['text'])):
-                if int(ocr_data['conf'][i]) > 30:  # Filter low confidence words
-                    word = ocr_data['text'][i].strip()
-                    if word:
-                        words.append({
-                            'text': word,
-                            'left': ocr_data['left'][i],
-                            'top': ocr_data['top'][i],
-                            'width': ocr_data['width'][i],
-                            'height': ocr_data['height'][i],
-                            'conf': ocr_data['conf'][i]
-                        })
-            
-            if not words:
+            if confidences is None:
+                confidences = self._ocr_confidences(ocr_data)
+            
+            # Keep confident, non-blank words
+            texts = [text.strip() for text in ocr_data['text']]
+            confident = confidences > 30
+            keep = np.flatnonzero(confident & np.fromiter(map(bool, texts), dtype=bool, count=len(texts)))
+            
+            if not keep.size:
                 return []
             
-            # Group words into rows based on vertical position
-            words.sort(key=lambda x: x['top'])
+            # Order words top to bottom; a stable sort keeps OCR order among equal tops
+            keep = keep[np.argsort(np.asarray(ocr_data['top'])[keep], kind='stable')]
+            tops = np.asarray(ocr_data['top'])[keep]
+            lefts = np.asarray(ocr_data['left'])[keep]
             
-            rows = []
-            current_row = []
+            # Find row starts: a word opens a new row when it is more than row_threshold
+            # from the current row's mean top. The mean depends on the words already in
+            # the row, so this scan stays sequential, but it only records break indices.
             row_threshold = 20  # Pixels tolerance for same row
-            
-            for word in words:
-                if not current_row:
-                    current_row = [word]
-                else:
-                    # Check if word is in same row
-                    avg_top = sum(w['top'] for w in current_row) / len(current_row)
-                    if abs(word['top'] - avg_top) <= row_threshold:
-                        current_row.append(word)
-                    else:
-                        # Sort current row by horizontal position and add to rows
-                        current_row.sort(key=lambda x: x['left'])
-                        rows.append(current_row)
-                        current_row = [word]
-            
-            # Add last row
-            if current_row:
-                current_row.sort(key=lambda x: x['left'])
-                rows.append(current_row)
-            
-            # Convert to table structure
-            table_data = []
-            for row in rows:
-                row_text = [word['text'] for word in row]
-                table_data.append(row_text)
+            row_ids = np.empty(len(tops), dtype=np.intp)
+            row_id = 0
+            row_start = 0
+            row_top_sum = 0
+            
+            for i, top in enumerate(tops.tolist()):
+                if i > row_start and abs(top - row_top_sum / (i - row_start)) > row_threshold:
+                    row_id += 1
+                    row_start = i
+                    row_top_sum = 0
+                row_top_sum += top
+                row_ids[i] = row_id
+            
+            # Sort every row by horizontal position in one pass; lexsort is stable, so
+            # words with equal left keep their top-to-bottom order
+            order = np.lexsort((lefts, row_ids))
+            row_starts = np.flatnonzero(np.diff(row_ids)) + 1
+            words = [texts[i] for i in keep[order].tolist()]
+            bounds = [0, *row_starts.tolist(), len(words)]
+            table_data = [words[start:stop] for start, stop in zip(bounds, bounds[1:])]
             
             # Normalize column count
-            if table_data:
-                max_cols = max(len(row) for row in table_data)
-                for row in table_data:
-                    while len(row) < max_cols:
-                        row.append('')
+            max_cols = max(map(len, table_data))
+            for row in table_data:
+                row.extend([''] * (max_cols - len(row)))
             
             return table_data
             
@@ -349,11 +593,13 @@ class ImageExtractor:
             logger.error(f"OCR parsing failed: {str(e)}")
             return []
     
-    def _calculate_ocr_confidence(self, ocr_data: Dict) -> float:
+    def _calculate_ocr_confidence(self, ocr_data: Dict, confidences: Optional[np.ndarray] = None) -> float:
         """Calculate average OCR confidence score"""
         try:
-            confidences = [int(conf) for conf in ocr_data['conf'] if int(conf) > 0]
-            return sum(confidences) / len(confidences) / 100.0 if confidences else 0.0
+            if confidences is None:
+                confidences = self._ocr_confidences(ocr_data)
+            recognized = confidences[confidences > 0]
+            return float(recognized.mean()) / 100.0 if recognized.size else 0.0
         except:
             return 0.0
     
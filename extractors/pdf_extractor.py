@@ -1,5 +1,8 @@
 import logging
+import math
 import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import pandas as pd
 from typing import List, Dict, Any, Optional
 import pdfplumber
@@ -8,8 +11,25 @@ import camelot
 import tempfile
 import os
 
+from utils.process_pool import subfile_pool
+
 logger = logging.getLogger(__name__)
 
+# PDFs with at least this many pages have pdfplumber's table detection split across processes
+PARALLEL_MIN_PAGES = 8
+
+# Pages where every pdfplumber table meets both bars are trusted on their own; the slower
+# tabula (JVM) and camelot (Ghostscript) backends only read the remaining pages
+SUFFICIENT_MIN_CELLS = 6
+SUFFICIENT_MIN_FILL = 0.9
+
+def _pdfplumber_page_range(args):
+    """Extract cleaned tables from pages [start, stop) of a PDF; runs in a worker process"""
+    file_path, start, stop = args
+    extractor = PdfExtractor()
+    with pdfplumber.open(file_path) as pdf:
+        return extractor._pdfplumber_pages(pdf.pages[start:stop], start)
+
 class PdfExtractor:
     """Extract tables and data from PDF files using multiple methods"""
     
@@ -42,22 +62,36 @@ class PdfExtractor:
             warnings = []
             method_results = {}
             
-            for method_name, extract_func in extraction_methods:
-                try:
-                    logger.info(f"Trying extraction method: {method_name}")
-                    method_result = extract_func(file_path)
-                    method_results[method_name] = method_result
-                    
-                    if method_result.get('success') and method_result.get('tables'):
-                        # Add method info to each table
-                        for table in method_result['tables']:
-                            table['extraction_method'] = method_name
-                        all_tables.extend(method_result['tables'])
-                        logger.info(f"{method_name} extracted {len(method_result['tables'])} tables")
+            # pdfplumber is the cheapest backend; when its tables are already complete the
+            # others would only produce duplicates, so run it first and stop there
+            primary_name, primary_func = extraction_methods[0]
+            logger.info(f"Trying extraction method: {primary_name}")
+            self._merge_method_result(primary_name, lambda: primary_func(file_path),
+                                      method_results, all_tables, warnings)
+            
+            remaining_methods = extraction_methods[1:]
+            uncovered_pages = self._uncovered_pages(method_results.get(primary_name, {}))
+            if uncovered_pages == []:
+                logger.info(f"{primary_name} tables look complete on every page, skipping remaining methods")
+                remaining_methods = []
+            
+            # Only pages pdfplumber did not fully cover are handed to the fallbacks, so a second
+            # table pdfplumber misses on a page it covered is not recovered by them
+            pages = 'all' if uncovered_pages is None else ','.join(map(str, uncovered_pages))
+            
+            # The fallback backends are independent and mostly wait on subprocesses (tabula's
+            # JVM, camelot's Ghostscript) or C code, so run them side by side
+            if remaining_methods:
+                with ThreadPoolExecutor(max_workers=len(remaining_methods)) as executor:
+                    futures = []
+                    for method_name, extract_func in remaining_methods:
+                        logger.info(f"Trying extraction method: {method_name} (pages: {pages})")
+                        futures.append((method_name, executor.submit(extract_func, file_path, pages)))
                     
-                except Exception as e:
-                    logger.warning(f"Method {method_name} failed: {str(e)}")
-                    warnings.append(f"Extraction method {method_name} failed: {str(e)}")
+                    # Merge in method order so deduplication keeps the same table when tied
+                    for method_name, future in futures:
+                        self._merge_method_result(method_name, future.result,
+                                                  method_results, all_tables, warnings)
             
             # Deduplicate and merge similar tables
             unique_tables = self._deduplicate_tables(all_tables)
@@ -89,31 +123,99 @@ class PdfExtractor:
                 'details': {'error_type': type(e).__name__, 'file_path': file_path}
             }
     
+    def _merge_method_result(self, method_name: str, get_result, method_results: Dict,
+                             all_tables: List[Dict], warnings: List[str]) -> None:
+        """Record one backend's result and collect its tables, tagged with the method name"""
+        try:
+            method_result = get_result()
+            method_results[method_name] = method_result
+            
+            if method_result.get('success') and method_result.get('tables'):
+                # Add method info to each table
+                for table in method_result['tables']:
+                    table['extraction_method'] = method_name
+                all_tables.extend(method_result['tables'])
+                logger.info(f"{method_name} extracted {len(method_result['tables'])} tables")
+            
+        except Exception as e:
+            logger.warning(f"Method {method_name} failed: {str(e)}")
+            warnings.append(f"Extraction method {method_name} failed: {str(e)}")
+    
+    def _uncovered_pages(self, method_result: Dict[str, Any]) -> Optional[List[int]]:
+        """
+        Find the pages whose tables are not good enough to skip the other methods
+        
+        Args:
+            method_result: Result dictionary from the pdfplumber method
+            
+        Returns:
+            Sorted 1-based page numbers that have no table or an incomplete one, or None
+            when the method failed and every page needs the other methods
+        """
+        page_count = method_result.get('page_count')
+        if not method_result.get('success') or not page_count:
+            return None
+        
+        sufficient_pages = set()
+        insufficient_pages = set()
+        for table in method_result.get('tables', []):
+            if self._is_sufficient_table(table):
+                sufficient_pages.add(table['page'])
+            else:
+                insufficient_pages.add(table['page'])
+        
+        return [page for page in range(1, page_count + 1)
+                if page not in sufficient_pages or page in insufficient_pages]
+    
+    def _is_sufficient_table(self, table: Dict[str, Any]) -> bool:
+        """
+        Check whether a table is larger than a token grid and nearly fully populated
+        
+        Args:
+            table: Table dictionary with data, rows and columns
+            
+        Returns:
+            True if the table needs no second opinion from another backend
+        """
+        total_cells = table['rows'] * table['columns']
+        if total_cells <= SUFFICIENT_MIN_CELLS:
+            return False
+        filled_cells = sum(1 for row in table['data'] for cell in row if cell)
+        return filled_cells / total_cells >= SUFFICIENT_MIN_FILL
+    
     def _extract_with_pdfplumber(self, file_path: str) -> Dict[str, Any]:
         """Extract tables using pdfplumber"""
         try:
             tables_data = []
             
             with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    page_tables = page.extract_tables()
-                    
-                    for table_idx, table in enumerate(page_tables):
-                        if table and len(table) > 0:
-                            # Clean and process table
-                            cleaned_table = self._clean_table_data(table)
-                            if cleaned_table:
-                                tables_data.append({
-                                    'table_index': len(tables_data),
-                                    'page': page_num + 1,
-                                    'data': cleaned_table,
-                                    'rows': len(cleaned_table),
-                                    'columns': len(cleaned_table[0]) if cleaned_table else 0
-                                })
+                page_count = len(pdf.pages)
+                workers = min(subfile_pool.max_workers, page_count)
+                
+                if page_count < PARALLEL_MIN_PAGES or workers <= 1:
+                    page_tables = self._pdfplumber_pages(pdf.pages, 0)
+                else:
+                    # pdfplumber objects can't be pickled, so each worker reopens the file
+                    # and handles one contiguous slice of pages; map keeps page order. The
+                    # shared pool caps processes across concurrent requests.
+                    chunk_size = math.ceil(page_count / workers)
+                    ranges = [(file_path, start, min(start + chunk_size, page_count))
+                              for start in range(0, page_count, chunk_size)]
+                    page_tables = list(chain.from_iterable(subfile_pool.map(_pdfplumber_page_range, ranges)))
+            
+            for page_num, cleaned_table in page_tables:
+                tables_data.append({
+                    'table_index': len(tables_data),
+                    'page': page_num + 1,
+                    'data': cleaned_table,
+                    'rows': len(cleaned_table),
+                    'columns': len(cleaned_table[0]) if cleaned_table else 0
+                })
             
             return {
                 'success': True,
                 'tables': tables_data,
+                'page_count': page_count,
                 'method': 'pdfplumber'
             }
             
@@ -121,13 +223,36 @@ class PdfExtractor:
             logger.error(f"PDFPlumber extraction failed: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def _extract_with_tabula(self, file_path: str) -> Dict[str, Any]:
-        """Extract tables using tabula-py"""
+    def _pdfplumber_pages(self, pages, first_page: int) -> List[tuple]:
+        """
+        Detect and clean the tables on a run of pdfplumber pages
+        
+        Args:
+            pages: Consecutive pdfplumber pages
+            first_page: Zero-based page number of pages[0]
+            
+        Returns:
+            List of (page number, cleaned table) tuples in page order
+        """
+        page_tables = []
+        
+        for page_num, page in enumerate(pages, first_page):
+            for table in page.extract_tables():
+                if table and len(table) > 0:
+                    # Clean and process table
+                    cleaned_table = self._clean_table_data(table)
+                    if cleaned_table:
+                        page_tables.append((page_num, cleaned_table))
+        
+        return page_tables
+    
+    def _extract_with_tabula(self, file_path: str, pages: str = 'all') -> Dict[str, Any]:
+        """Extract tables using tabula-py from the given pages ('all' or e.g. '1,3,4')"""
         try:
             tables_data = []
             
-            # Read all tables from PDF
-            dfs = tabula.read_pdf(file_path, pages='all', multiple_tables=True, silent=True)
+            # Read the tables on the requested pages
+            dfs = tabula.read_pdf(file_path, pages=pages, multiple_tables=True, silent=True)
             
             for idx, df in enumerate(dfs):
                 if not df.empty:
@@ -136,14 +261,15 @@ class PdfExtractor:
                     
                     # Add headers if they exist
                     if not df.columns.empty:
-                        headers = [str(col) if col and str(col) != 'nan' else f'Column_{i}' 
+                        headers = [text if col and (text := str(col)) != 'nan' else f'Column_{i}' 
                                  for i, col in enumerate(df.columns)]
                         table_data.append(headers)
                     
-                    # Add data rows
-                    for _, row in df.iterrows():
-                        row_data = [str(cell) if cell and str(cell) != 'nan' else '' 
-                                  for cell in row.values]
+                    # Add data rows; one array conversion instead of a Series per row,
+                    # and each cell is converted to str once
+                    for row in df.to_numpy().tolist():
+                        row_data = [text if cell and (text := str(cell)) != 'nan' else '' 
+                                  for cell in row]
                         table_data.append(row_data)
                     
                     if table_data:
@@ -164,13 +290,13 @@ class PdfExtractor:
             logger.error(f"Tabula extraction failed: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def _extract_with_camelot(self, file_path: str) -> Dict[str, Any]:
-        """Extract tables using camelot-py"""
+    def _extract_with_camelot(self, file_path: str, pages: str = 'all') -> Dict[str, Any]:
+        """Extract tables using camelot-py from the given pages ('all' or e.g. '1,3,4')"""
         try:
             tables_data = []
             
             # Extract tables using camelot
-            tables = camelot.read_pdf(file_path, pages='all', flavor='lattice')
+            tables = camelot.read_pdf(file_path, pages=pages, flavor='lattice')
             
             for idx, table in enumerate(tables):
                 df = table.df
@@ -178,9 +304,10 @@ class PdfExtractor:
                     # Convert DataFrame to list of lists
                     table_data = []
                     
-                    for _, row in df.iterrows():
-                        row_data = [str(cell).strip() if cell and str(cell) != 'nan' else '' 
-                                  for cell in row.values]
+                    # One array conversion instead of a Series per row, and one str() per cell
+                    for row in df.to_numpy().tolist():
+                        row_data = [text.strip() if cell and (text := str(cell)) != 'nan' else '' 
+                                  for cell in row]
                         if any(cell for cell in row_data):  # Only add non-empty rows
                             table_data.append(row_data)
                     
@@ -213,28 +340,20 @@ class PdfExtractor:
         for row in table_data:
             if row is None:
                 continue
-                
-            cleaned_row = []
-            for cell in row:
-                if cell is None:
-                    cleaned_row.append('')
-                else:
-                    # Clean cell text
-                    cell_text = str(cell).strip()
-                    # Remove extra whitespace
-                    cell_text = ' '.join(cell_text.split())
-                    cleaned_row.append(cell_text)
+            
+            # str.split() both strips and collapses whitespace in one C-level pass
+            cleaned_row = ['' if cell is None else ' '.join(str(cell).split()) for cell in row]
             
             # Only add rows that have some content
-            if any(cell for cell in cleaned_row):
+            if any(cleaned_row):
                 cleaned_table.append(cleaned_row)
         
         # Normalize column count
         if cleaned_table:
-            max_cols = max(len(row) for row in cleaned_table)
-            for row in cleaned_table:
-                while len(row) < max_cols:
-                    row.append('')
+            max_cols = max(map(len, cleaned_table))
+            if min(map(len, cleaned_table)) < max_cols:
+                for row in cleaned_table:
+                    row.extend([''] * (max_cols - len(row)))
         
         return cleaned_table
     
@@ -244,33 +363,35 @@ class PdfExtractor:
             return []
         
         unique_tables = []
+        # Only tables with identical dimensions can be duplicates, so each table is
+        # compared against its (rows, columns) bucket instead of every kept table.
+        # Buckets hold (signature, table) in the same relative order as unique_tables.
+        buckets = {}
         
         for table in tables:
-            is_duplicate = False
             table_data = table.get('data', [])
+            if not table_data:
+                unique_tables.append(table)
+                continue
             
-            # Check against existing tables
-            for existing_table in unique_tables:
-                existing_data = existing_table.get('data', [])
-                
-                # Simple similarity check based on dimensions and first few cells
-                if (len(table_data) == len(existing_data) and 
-                    len(table_data) > 0 and len(existing_data) > 0 and
-                    len(table_data[0]) == len(existing_data[0])):
-                    
-                    # Check first few cells for similarity
-                    similarity_score = self._calculate_table_similarity(table_data, existing_data)
-                    if similarity_score > 0.8:  # 80% similarity threshold
-                        is_duplicate = True
-                        # Keep table with higher accuracy if available
-                        if table.get('accuracy', 0) > existing_table.get('accuracy', 0):
-                            # Replace existing table
-                            unique_tables.remove(existing_table)
-                            unique_tables.append(table)
-                        break
-            
-            if not is_duplicate:
+            bucket = buckets.setdefault((len(table_data), len(table_data[0])), [])
+            signature = self._table_signature(table_data)
+            
+            for position, (existing_signature, existing_table) in enumerate(bucket):
+                # Check first few cells for similarity
+                similarity_score = self._calculate_table_similarity(signature, existing_signature)
+                if similarity_score > 0.8:  # 80% similarity threshold
+                    # Keep table with higher accuracy if available
+                    if table.get('accuracy', 0) > existing_table.get('accuracy', 0):
+                        # Replace existing table
+                        unique_tables.remove(existing_table)
+                        unique_tables.append(table)
+                        del bucket[position]
+                        bucket.append((signature, table))
+                    break
+            else:
                 unique_tables.append(table)
+                bucket.append((signature, table))
         
         # Re-index tables
         for i, table in enumerate(unique_tables):
@@ -278,33 +399,28 @@ class PdfExtractor:
         
         return unique_tables
     
-    def _calculate_table_similarity(self, table1: List[List], table2: List[List]) -> float:
-        """Calculate similarity score between two tables"""
-        if not table1 or not table2:
-            return 0.0
-        
-        # Compare first 3 rows and first 3 columns for efficiency
-        rows_to_check = min(3, len(table1), len(table2))
-        cols_to_check = min(3, len(table1[0]) if table1 else 0, len(table2[0]) if table2 else 0)
+    def _table_signature(self, table: List[List]) -> List[List[str]]:
+        """Normalized top-left 3x3 corner of a table, computed once per table for comparisons"""
+        cols_to_check = min(3, len(table[0]))
+        return [[cell.strip().lower() for cell in row[:cols_to_check]] for row in table[:3]]
+    
+    def _calculate_table_similarity(self, signature1: List[List[str]], signature2: List[List[str]]) -> float:
+        """Calculate similarity score between two same-sized tables from their signatures"""
+        rows_to_check = min(len(signature1), len(signature2))
+        cols_to_check = min(len(signature1[0]), len(signature2[0])) if rows_to_check else 0
+        total_cells = rows_to_check * cols_to_check
         
-        if rows_to_check == 0 or cols_to_check == 0:
+        if total_cells == 0:
             return 0.0
         
-        matching_cells = 0
-        total_cells = rows_to_check * cols_to_check
-        
-        for i in range(rows_to_check):
-            for j in range(cols_to_check):
-                if (i < len(table1) and j < len(table1[i]) and 
-                    i < len(table2) and j < len(table2[i])):
-                    
-                    cell1 = table1[i][j].strip().lower()
-                    cell2 = table2[i][j].strip().lower()
-                    
-                    if cell1 == cell2:
-                        matching_cells += 1
+        # zip stops at the shorter row, so ragged rows only compare cells both tables have
+        matching_cells = sum(
+            cell1 == cell2
+            for row1, row2 in zip(signature1, signature2)
+            for cell1, cell2 in zip(row1, row2)
+        )
         
-        return matching_cells / total_cells if total_cells > 0 else 0.0
+        return matching_cells / total_cells
     
     def _calculate_quality_metrics(self, tables_data: List[Dict], method_results: Dict) -> Dict[str, Any]:
         """Calculate quality metrics for PDF extraction"""
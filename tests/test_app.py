@@ -0,0 +1,83 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from docx import Document
+
+import app as app_module
+from utils.file_sweeper import FileSweeper
+from utils.result_cache import ResultCache
+
+def make_docx() -> bytes:
+    document = Document()
+    table = document.add_table(rows=3, cols=2)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = 'Name' if r == 0 and c == 0 else f'r{r}c{c}'
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+class UploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.upload_dir = os.path.join(self.tmp_dir.name, 'uploads')
+        output_dir = os.path.join(self.tmp_dir.name, 'outputs')
+        os.makedirs(self.upload_dir)
+        os.makedirs(output_dir)
+
+        # Keep uploads, results and sweeping inside the temp dir
+        patches = [
+            mock.patch.dict(app_module.app.config, UPLOAD_FOLDER=self.upload_dir, OUTPUT_FOLDER=output_dir),
+            mock.patch.object(app_module, 'result_cache', ResultCache(output_dir)),
+            mock.patch.object(app_module, 'file_sweeper', FileSweeper([self.upload_dir, output_dir])),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.client = app_module.app.test_client()
+
+    def _convert(self, data, filename='report.docx'):
+        response = self.client.post('/api/convert', data={'file': (io.BytesIO(data), filename)},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        return response.get_json()
+
+    def _wait_for_empty_uploads(self):
+        deadline = time.monotonic() + 5
+        while os.listdir(self.upload_dir) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return os.listdir(self.upload_dir)
+
+    def test_upload_is_hashed_while_streaming_and_cached(self):
+        data = make_docx()
+
+        first = self._convert(data)
+        second = self._convert(data, filename='renamed.docx')
+
+        self.assertTrue(first['success'])
+        self.assertEqual(first['file_id'], hashlib.sha256(data).hexdigest())
+        self.assertFalse(first.get('cached', False))
+        self.assertEqual(second['file_id'], first['file_id'])
+        self.assertIs(second['cached'], True)
+        self.assertEqual(self._wait_for_empty_uploads(), [])
+
+    def test_download_after_upload(self):
+        result = self._convert(make_docx())
+
+        response = self.client.get(result['download_url'])
+        body = response.get_data(as_text=True)
+        response.close()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('r1c1', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+from extractors.docx_extractor import DocxExtractor
+
+def reference_rows(extractor, table):
+    """What the python-docx implementation produced: cleaned row.cells text, blank rows dropped"""
+    rows = []
+    for row in table.rows:
+        row_data = [extractor._clean_cell_text(cell.text.strip()) for cell in row.cells]
+        if any(row_data):
+            rows.append(row_data)
+    width = max(map(len, rows), default=0)
+    return [row + [''] * (width - len(row)) for row in rows]
+
+def build_document(path):
+    document = Document()
+
+    # Horizontal, vertical and block merges plus whitespace that needs cleaning
+    merged = document.add_table(rows=5, cols=4)
+    for r, row in enumerate(merged.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f'r{r}c{c}'
+    merged.cell(0, 0).merge(merged.cell(0, 1)).text = 'Wide  header'
+    merged.cell(1, 3).merge(merged.cell(3, 3)).text = 'Tall\tcell'
+    merged.cell(2, 0).merge(merged.cell(3, 1)).text = 'Block'
+    merged.cell(4, 1).paragraphs[0].add_run().add_break()
+    merged.cell(4, 1).add_paragraph('second paragraph')
+    merged.cell(4, 2).text = ''
+
+    # A blank row that should be dropped, and a merge that spans the whole row
+    sparse = document.add_table(rows=3, cols=3)
+    sparse.cell(0, 0).merge(sparse.cell(0, 2)).text = 'Title'
+    sparse.cell(2, 0).text = 'a'
+    sparse.cell(2, 2).text = 'c'
+
+    # A row that starts after a skipped grid column (w:gridBefore)
+    shifted = document.add_table(rows=2, cols=3)
+    for r, row in enumerate(shifted.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f's{r}{c}'
+    tr = shifted.rows[1]._tr
+    tr.remove(tr.tc_lst[0])
+    tr.insert(0, parse_xml(f'<w:trPr {nsdecls("w")}><w:gridBefore w:val="1"/></w:trPr>'))
+
+    document.save(path)
+
+class DocxMergedCellTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp_dir.name, 'merged.docx')
+        build_document(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        self.extractor = DocxExtractor()
+        self.tables = Document(self.path).tables
+
+    def test_each_table_matches_row_cells(self):
+        for index, table in enumerate(self.tables):
+            with self.subTest(table=index):
+                self.assertEqual(self.extractor._extract_single_table(table, index),
+                                 reference_rows(self.extractor, table))
+
+    def test_merged_values_are_repeated(self):
+        rows = self.extractor._extract_single_table(self.tables[0], 0)
+
+        self.assertEqual(rows[0][:2], ['Wide header', 'Wide header'])
+        self.assertEqual([row[3] for row in rows[1:4]], ['Tall cell'] * 3)
+        self.assertEqual([row[:2] for row in rows[2:4]], [['Block', 'Block']] * 2)
+        self.assertEqual(rows[4][1], 'r4c1 second paragraph')
+
+    def test_blank_rows_are_dropped(self):
+        rows = self.extractor._extract_single_table(self.tables[1], 1)
+
+        self.assertEqual(rows, [['Title'] * 3, ['a', '', 'c']])
+
+    def test_extract_tables_parallel_matches_sequential(self):
+        sequential = self.extractor.extract_tables(self.path)
+        parallel = self.extractor.extract_tables_parallel(self.path, 2)
+
+        self.assertTrue(sequential['success'])
+        self.assertEqual([table['data'] for table in parallel['tables']],
+                         [table['data'] for table in sequential['tables']])
+        self.assertEqual([table['data'] for table in sequential['tables']],
+                         [reference_rows(self.extractor, table) for table in self.tables])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+import unittest
+
+from utils.file_sweeper import FileSweeper
+
+class FileSweeperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.root = self.tmp_dir.name
+
+    def _make_file(self, *parts, age=0):
+        path = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+        if age:
+            mtime = time.time() - age
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_sweep_removes_only_stale_files(self):
+        stale = self._make_file('stale.csv', age=7200)
+        fresh = self._make_file('fresh.csv')
+        hidden = self._make_file('.gitkeep', age=7200)
+
+        FileSweeper([self.root], max_age=3600).sweep()
+
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(hidden))
+
+    def test_sweep_removes_emptied_subdirectories(self):
+        self._make_file('emptied', 'old.csv', age=7200)
+        kept = self._make_file('kept', 'new.csv')
+
+        FileSweeper([self.root], max_age=3600).sweep()
+
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'emptied')))
+        self.assertTrue(os.path.exists(kept))
+        # The swept folders themselves are never removed
+        self.assertTrue(os.path.isdir(self.root))
+
+    def test_sweep_skips_missing_folder(self):
+        with self.assertLogs('utils.file_sweeper', level='WARNING'):
+            FileSweeper([os.path.join(self.root, 'missing')]).sweep()
+
+    def _wait_until_removed(self, path):
+        deadline = time.monotonic() + 5
+        while os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not os.path.exists(path)
+
+    def test_discard_starts_thread_and_removes_file(self):
+        path = self._make_file('upload.tmp')
+        sweeper = FileSweeper([self.root], interval=3600)
+
+        sweeper.discard(path)
+        sweeper.discard(os.path.join(self.root, 'already-gone.tmp'))
+
+        self.assertTrue(self._wait_until_removed(path))
+        self.assertTrue(sweeper._thread.is_alive())
+
+    def test_start_is_idempotent(self):
+        sweeper = FileSweeper([self.root], interval=3600)
+        sweeper.start()
+        thread = sweeper._thread
+        sweeper.start()
+
+        self.assertIs(sweeper._thread, thread)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_forked_child_runs_its_own_sweeper(self):
+        sweeper = FileSweeper([self.root], interval=3600)
+        sweeper.start()
+        path = self._make_file('child-upload.tmp')
+
+        pid = os.fork()
+        if pid == 0:
+            # The parent's thread is gone here; discard must start a new one
+            sweeper.discard(path)
+            os._exit(0 if self._wait_until_removed(path) else 1)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertFalse(os.path.exists(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import queue
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from extractors import image_extractor
+from extractors.image_extractor import ImageExtractor
+from utils.ocr_cache import OcrCache
+
+# (text, confidence, (left, top, right, bottom)) for each word Tesseract "recognizes"
+WORDS = [
+    ('Name', 95.5, (10, 12, 60, 30)),
+    ('Value', 91.0, (200, 11, 260, 30)),
+    ('alpha', 88.25, (10, 52, 62, 70)),
+    ('12.5', 90.0, (200, 50, 240, 70)),
+    ('noise', 12.0, (120, 90, 150, 100)),
+]
+
+# Every column pytesseract.image_to_data(..., output_type=Output.DICT) returns
+PYTESSERACT_COLUMNS = {'level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                       'left', 'top', 'width', 'height', 'conf', 'text'}
+
+def pytesseract_dict(words):
+    """The same words as pytesseract's DICT output, led by the page-level row it emits"""
+    data = {column: [] for column in PYTESSERACT_COLUMNS}
+    rows = [('', -1, (0, 0, 300, 120), 1)] + [(text, conf, box, 5) for text, conf, box in words]
+    for word_num, (text, conf, (left, top, right, bottom), level) in enumerate(rows):
+        data['level'].append(level)
+        data['page_num'].append(1)
+        data['block_num'].append(1 if level > 1 else 0)
+        data['par_num'].append(1 if level > 1 else 0)
+        data['line_num'].append(1 if level > 1 else 0)
+        data['word_num'].append(word_num)
+        data['left'].append(left)
+        data['top'].append(top)
+        data['width'].append(right - left)
+        data['height'].append(bottom - top)
+        data['conf'].append(conf)
+        data['text'].append(text)
+    return data
+
+class FakeWord:
+    def __init__(self, text, conf, box):
+        self.text, self.conf, self.box = text, conf, box
+
+    def BoundingBox(self, level):
+        return self.box
+
+    def GetUTF8Text(self, level):
+        return self.text
+
+    def Confidence(self, level):
+        return self.conf
+
+class FakeTessBaseAPI:
+    """Records the settings the extractor applies and replays WORDS as recognized words"""
+
+    def __init__(self, oem=None):
+        self.psm = None
+        self.variables = {}
+        self.image = None
+        self.cleared = False
+
+    def SetPageSegMode(self, psm):
+        self.psm = psm
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+
+    def SetImageBytes(self, data, width, height, bytes_per_pixel, bytes_per_line):
+        self.image = (width, height, bytes_per_pixel, bytes_per_line)
+
+    def Recognize(self):
+        pass
+
+    def GetIterator(self):
+        return [FakeWord(*word) for word in WORDS]
+
+    def GetUTF8Text(self):
+        return 'Name Value\nalpha 12.5\n'
+
+    def Clear(self):
+        self.cleared = True
+
+fake_tesserocr = types.SimpleNamespace(
+    PyTessBaseAPI=FakeTessBaseAPI,
+    OEM=types.SimpleNamespace(DEFAULT=3),
+    PSM=types.SimpleNamespace(AUTO=3),
+    RIL=types.SimpleNamespace(WORD=3),
+    iterate_level=lambda iterator, level: iter(iterator),
+    tesseract_version=lambda: 'tesseract 5.3.0',
+)
+
+class TesserocrBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+        self.idle_apis = queue.SimpleQueue()
+        patches = [
+            mock.patch.object(image_extractor, 'tesserocr', fake_tesserocr),
+            mock.patch.object(image_extractor, '_idle_tess_apis', self.idle_apis),
+            mock.patch.object(image_extractor, '_tesseract_version', return_value='5.3.0'),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.extractor = ImageExtractor()
+        self.extractor.ocr_cache = OcrCache(self.tmp_dir.name)
+        self.image = np.full((120, 300), 255, dtype=np.uint8)
+
+    def test_image_to_data_matches_pytesseract_dict_shape(self):
+        ocr_data = self.extractor._image_to_data(self.image, '--oem 3 --psm 6')
+        expected = pytesseract_dict(WORDS)
+
+        self.assertLessEqual(set(ocr_data), PYTESSERACT_COLUMNS)
+        self.assertLessEqual({'text', 'conf', 'left', 'top', 'width', 'height'}, set(ocr_data))
+        # Word rows line up with pytesseract's once its page-level row is dropped
+        for column, values in ocr_data.items():
+            self.assertEqual(values, expected[column][1:], column)
+
+    def test_parsed_table_matches_pytesseract(self):
+        ocr_data = self.extractor._image_to_data(self.image, '--oem 3 --psm 6')
+        expected = self.extractor._parse_ocr_to_table(pytesseract_dict(WORDS), self.image.shape)
+
+        self.assertEqual(self.extractor._parse_ocr_to_table(ocr_data, self.image.shape), expected)
+        self.assertEqual(expected, [['Name', 'Value'], ['alpha', '12.5']])
+
+    def test_config_is_applied_and_api_is_returned_to_pool(self):
+        config = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789.'
+        self.extractor._image_to_data(self.image, config)
+
+        api = self.idle_apis.get_nowait()
+        self.assertEqual(api.psm, 6)
+        self.assertEqual(api.variables['tessedit_char_whitelist'], '0123456789.')
+        self.assertEqual(api.image, (300, 120, 1, 300))
+        self.assertTrue(api.cleared)
+
+    def test_image_to_string(self):
+        self.assertEqual(self.extractor._image_to_string(self.image, '--psm 6'), 'Name Value\nalpha 12.5\n')
+
+    def test_pytesseract_used_without_tesserocr(self):
+        with mock.patch.object(image_extractor, 'tesserocr', None), \
+                mock.patch.object(image_extractor.pytesseract, 'image_to_data',
+                                  return_value=pytesseract_dict(WORDS)) as image_to_data:
+            ocr_data = self.extractor._image_to_data(self.image, '--psm 6')
+
+        image_to_data.assert_called_once()
+        self.assertEqual(ocr_data, pytesseract_dict(WORDS))
+
+if __name__ == '__main__':
+    unittest.main()
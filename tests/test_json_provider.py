@@ -0,0 +1,69 @@
+import json
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+from flask import Flask, jsonify
+
+from utils.json_provider import OrjsonProvider
+
+class OrjsonProviderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = OrjsonProvider(self.app)
+
+    def test_response_matches_default_provider(self):
+        payload = {'b': [1, 2.5, None, True], 'a': {'text': 'Zürich', 'nested': []}}
+        default_app = Flask(__name__)
+
+        with self.app.app_context():
+            body = jsonify(payload).get_data()
+        with default_app.app_context():
+            expected = jsonify(payload).get_data()
+
+        self.assertEqual(json.loads(body), json.loads(expected))
+        self.assertTrue(body.endswith(b'\n'))
+        # Keys are sorted like the default provider's output; text is sent as raw UTF-8
+        self.assertEqual(json.loads(body, object_pairs_hook=list),
+                         json.loads(expected, object_pairs_hook=list))
+        self.assertIn('Zürich'.encode('utf-8'), body)
+
+    def test_response_mimetype_and_status(self):
+        with self.app.app_context():
+            response = jsonify(success=True)
+
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(response.get_json(), {'success': True})
+
+    def test_numpy_values_and_non_string_keys(self):
+        payload = {1: np.int64(3), 'scores': np.array([0.5, 1.0]), 'ok': np.bool_(True)}
+
+        with self.app.app_context():
+            data = json.loads(jsonify(payload).get_data())
+
+        self.assertEqual(data, {'1': 3, 'scores': [0.5, 1.0], 'ok': True})
+
+    def test_datetime_keeps_http_date_format(self):
+        moment = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+        with self.app.app_context():
+            data = json.loads(jsonify(when=moment).get_data())
+
+        self.assertEqual(data['when'], 'Tue, 02 Jan 2024 03:04:05 GMT')
+
+    def test_dumps_and_loads(self):
+        provider = self.app.json
+
+        self.assertEqual(provider.loads(provider.dumps({'a': [1, 'x']})), {'a': [1, 'x']})
+        self.assertEqual(provider.loads(b'{"a": 1}'), {'a': 1})
+        # json.dumps-only arguments fall back to the stdlib encoder
+        self.assertEqual(provider.dumps({'a': 1}, indent=4), '{\n    "a": 1\n}')
+
+    def test_unserializable_value_raises_type_error(self):
+        with self.app.app_context():
+            with self.assertRaises(TypeError):
+                jsonify(value=object())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from utils.ocr_cache import OcrCache
+
+class OcrCacheKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.image = np.arange(64, dtype=np.uint8).reshape(8, 8)
+
+    def test_key_is_stable(self):
+        key = OcrCache.make_key(self.image, 'image_to_data', '--psm 6', '5.3.0')
+
+        self.assertEqual(OcrCache.make_key(self.image.copy(), 'image_to_data', '--psm 6', '5.3.0'), key)
+        self.assertRegex(key, r'^[0-9a-f]{32}$')
+
+    def test_non_contiguous_view_matches_copy(self):
+        view = np.arange(128, dtype=np.uint8).reshape(8, 16)[:, ::2]
+
+        self.assertEqual(OcrCache.make_key(view, 'x'), OcrCache.make_key(np.ascontiguousarray(view), 'x'))
+
+    def test_key_depends_on_pixels_shape_dtype_and_parts(self):
+        key = OcrCache.make_key(self.image, 'image_to_data', '--psm 6')
+        changed = self.image.copy()
+        changed[0, 0] += 1
+
+        others = [
+            OcrCache.make_key(changed, 'image_to_data', '--psm 6'),
+            OcrCache.make_key(self.image.reshape(4, 16), 'image_to_data', '--psm 6'),
+            OcrCache.make_key(self.image.astype(np.int8), 'image_to_data', '--psm 6'),
+            OcrCache.make_key(self.image, 'image_to_string', '--psm 6'),
+            OcrCache.make_key(self.image, 'image_to_data', '--psm 7'),
+            # Parts are delimited, so moving text between them changes the key
+            OcrCache.make_key(self.image, 'image_to_data--psm', ' 6'),
+        ]
+        self.assertNotIn(key, others)
+        self.assertEqual(len(set(others)), len(others))
+
+class OcrCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.cache_dir = self.tmp_dir.name
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def test_put_then_get_from_memory_and_disk(self):
+        value = {'text': ['a', 'b'], 'conf': [90, 80]}
+        OcrCache(self.cache_dir).put('k1', value)
+
+        self.assertEqual(OcrCache(self.cache_dir).get('k1'), value)
+        self.assertEqual(os.listdir(self.cache_dir), ['k1.json'])
+
+    def test_miss(self):
+        self.assertIsNone(OcrCache(self.cache_dir).get('missing'))
+
+    def test_memory_lru_keeps_most_recently_used(self):
+        cache = OcrCache(self.cache_dir, max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertEqual(list(cache._memory), ['a', 'c'])
+
+    def test_disk_eviction_removes_least_recently_used(self):
+        cache = OcrCache(self.cache_dir, max_bytes=100)
+        for age, key in enumerate(['old', 'mid', 'new']):
+            cache.put(key, 'x' * 30)
+            mtime = 1000000 + age
+            os.utime(self._entry_path(key), (mtime, mtime))
+
+        cache.put('newest', 'x' * 30)
+
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['mid.json', 'new.json', 'newest.json'])
+
+    def test_eviction_rescans_only_when_over_budget(self):
+        cache = OcrCache(self.cache_dir, max_bytes=1000)
+        cache.put('a', 'x' * 10)
+        self.assertEqual(cache._disk_bytes, os.path.getsize(self._entry_path('a')))
+
+        # A file appearing behind the cache's back is only noticed once the total overflows
+        with open(self._entry_path('foreign'), 'w') as f:
+            f.write('"' + 'y' * 2000 + '"')
+        cache.put('b', 'x' * 10)
+        self.assertTrue(os.path.exists(self._entry_path('foreign')))
+
+        cache.put('c', 'x' * 980)
+        self.assertFalse(os.path.exists(self._entry_path('foreign')))
+        self.assertTrue(os.path.exists(self._entry_path('c')))
+        self.assertLessEqual(cache._disk_bytes, 1000)
+
+    def test_corrupt_entry_is_a_miss(self):
+        with open(self._entry_path('bad'), 'w') as f:
+            f.write('{"text": ["trunc')
+
+        with self.assertLogs('utils.ocr_cache', level='WARNING'):
+            self.assertIsNone(OcrCache(self.cache_dir).get('bad'))
+
+    def test_partial_write_is_ignored(self):
+        with open(os.path.join(self.cache_dir, 'k1.abc123.part'), 'w') as f:
+            f.write('{"text": ["trunc')
+
+        cache = OcrCache(self.cache_dir)
+        self.assertIsNone(cache.get('k1'))
+        cache.put('k1', {'text': []})
+        self.assertEqual(OcrCache(self.cache_dir).get('k1'), {'text': []})
+
+    def test_put_leaves_no_temp_files(self):
+        cache = OcrCache(self.cache_dir)
+        cache.put('k1', [1, 2, 3])
+        with self.assertLogs('utils.ocr_cache', level='WARNING'):
+            cache.put('k2', {'not json': object()})
+
+        self.assertEqual(os.listdir(self.cache_dir), ['k1.json'])
+        with open(self._entry_path('k1')) as f:
+            self.assertEqual(json.load(f), [1, 2, 3])
+
+    def test_unwritable_dir_disables_disk_cache(self):
+        blocker = os.path.join(self.cache_dir, 'file')
+        open(blocker, 'w').close()
+
+        with self.assertLogs('utils.ocr_cache', level='WARNING'):
+            cache = OcrCache(os.path.join(blocker, 'ocr'))
+        cache.put('k1', 'text')
+
+        self.assertIsNone(cache.cache_dir)
+        self.assertEqual(cache.get('k1'), 'text')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from extractors.pdf_extractor import PdfExtractor
+
+def table(page, data):
+    return {'page': page, 'data': data, 'rows': len(data), 'columns': len(data[0]) if data else 0}
+
+# 3x3, fully populated: more than SUFFICIENT_MIN_CELLS cells and above SUFFICIENT_MIN_FILL
+FULL = [['a', 'b', 'c'], ['1', '2', '3'], ['4', '5', '6']]
+# 3x3 with a third of the cells empty
+SPARSE = [['a', '', 'c'], ['1', '', '3'], ['', '5', '6']]
+# 2x3, too small to trust on its own
+TINY = [['a', 'b', 'c'], ['1', '2', '3']]
+
+class UncoveredPagesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.extractor = PdfExtractor()
+
+    def uncovered(self, tables, page_count=3, success=True):
+        return self.extractor._uncovered_pages({'success': success, 'tables': tables, 'page_count': page_count})
+
+    def test_all_pages_covered(self):
+        self.assertEqual(self.uncovered([table(1, FULL), table(2, FULL), table(3, FULL)]), [])
+
+    def test_pages_without_tables_are_uncovered(self):
+        self.assertEqual(self.uncovered([table(2, FULL)]), [1, 3])
+        self.assertEqual(self.uncovered([]), [1, 2, 3])
+
+    def test_one_insufficient_table_uncovers_its_page(self):
+        tables = [table(1, FULL), table(1, SPARSE), table(2, FULL), table(3, TINY)]
+
+        self.assertEqual(self.uncovered(tables), [1, 3])
+
+    def test_failed_or_unknown_extraction_needs_every_page(self):
+        self.assertIsNone(self.uncovered([table(1, FULL)], success=False))
+        self.assertIsNone(self.uncovered([table(1, FULL)], page_count=0))
+        self.assertIsNone(self.extractor._uncovered_pages({}))
+
+    def test_sufficient_table_thresholds(self):
+        self.assertTrue(self.extractor._is_sufficient_table(table(1, FULL)))
+        self.assertFalse(self.extractor._is_sufficient_table(table(1, SPARSE)))
+        self.assertFalse(self.extractor._is_sufficient_table(table(1, TINY)))
+
+if __name__ == '__main__':
+    unittest.main()
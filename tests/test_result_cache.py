@@ -0,0 +1,128 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils.result_cache import ResultCache
+
+def digest(name):
+    """A content hash like the ones app.py derives from uploads"""
+    return hashlib.sha256(name.encode()).hexdigest()
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.cache_dir = self.tmp_dir.name
+
+    def _write_csv(self, cache, content_hash, size=10):
+        with open(cache.csv_path(content_hash), 'w') as f:
+            f.write('x' * size)
+
+    def _meta_path(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def _set_mtime(self, cache, content_hash, mtime):
+        for path in (cache.csv_path(content_hash), self._meta_path(content_hash)):
+            os.utime(path, (mtime, mtime))
+
+    def test_put_then_get(self):
+        cache = ResultCache(self.cache_dir)
+        key = digest('abc')
+        metadata = {'conversion_stats': {'tables_found': 2, 'total_rows': 7}}
+        self._write_csv(cache, key)
+        cache.put(key, metadata)
+
+        self.assertEqual(ResultCache(self.cache_dir).get(key), metadata)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), [f"{key}.json", f"{key}_converted.csv"])
+
+    def test_miss_without_csv_or_metadata(self):
+        cache = ResultCache(self.cache_dir)
+        csv_only, meta_only = digest('csv_only'), digest('meta_only')
+        self._write_csv(cache, csv_only)
+        cache.put(meta_only, {'a': 1})
+
+        self.assertIsNone(cache.get(csv_only))
+        self.assertIsNone(cache.get(meta_only))
+
+    def test_corrupt_metadata_is_a_miss(self):
+        cache = ResultCache(self.cache_dir)
+        key = digest('abc')
+        self._write_csv(cache, key)
+        with open(self._meta_path(key), 'w') as f:
+            f.write('{"conversion_stats": ')
+
+        with self.assertLogs('utils.result_cache', level='WARNING'):
+            self.assertIsNone(cache.get(key))
+
+    def test_get_refreshes_entry_for_eviction(self):
+        cache = ResultCache(self.cache_dir)
+        key = digest('abc')
+        self._write_csv(cache, key)
+        cache.put(key, {})
+        self._set_mtime(cache, key, 1000000)
+
+        cache.get(key)
+
+        self.assertGreater(os.path.getmtime(cache.csv_path(key)), 1000000)
+
+    def test_eviction_removes_least_recently_used(self):
+        cache = ResultCache(self.cache_dir, max_bytes=100)
+        old, new, newest = digest('old'), digest('new'), digest('newest')
+        for age, key in enumerate([old, new]):
+            self._write_csv(cache, key, size=40)
+            cache.put(key, {})
+            self._set_mtime(cache, key, 1000000 + age)
+
+        self._write_csv(cache, newest, size=40)
+        cache.put(newest, {})
+
+        self.assertIsNone(cache.get(old))
+        self.assertEqual(cache.get(new), {})
+        self.assertEqual(cache.get(newest), {})
+        self.assertLessEqual(cache._total_bytes, 100)
+
+    def test_eviction_skips_temp_and_foreign_files(self):
+        cache = ResultCache(self.cache_dir, max_bytes=50)
+        in_flight = cache.csv_path(digest('writing')) + '.x1y2.part'
+        foreign = os.path.join(self.cache_dir, '7a11d31b-4811-4925-acc0-4c99159e3396_converted.csv')
+        for path in (in_flight, foreign):
+            with open(path, 'w') as f:
+                f.write('y' * 500)
+            os.utime(path, (1000000, 1000000))
+
+        key = digest('abc')
+        self._write_csv(cache, key, size=40)
+        cache.put(key, {})
+
+        self.assertTrue(os.path.exists(in_flight))
+        self.assertTrue(os.path.exists(foreign))
+        self.assertEqual(cache.get(key), {})
+        self.assertLessEqual(cache._total_bytes, 50)
+
+    def test_put_scans_once_then_tracks_size(self):
+        cache = ResultCache(self.cache_dir, max_bytes=1000)
+        with mock.patch.object(cache, '_evict', wraps=cache._evict) as evict:
+            for name in ('a', 'b', 'c'):
+                self._write_csv(cache, digest(name))
+                cache.put(digest(name), {})
+
+        evict.assert_called_once()
+        self.assertEqual(cache._total_bytes, sum(os.path.getsize(os.path.join(self.cache_dir, name))
+                                                 for name in os.listdir(self.cache_dir)))
+
+    def test_failed_put_leaves_no_files(self):
+        cache = ResultCache(self.cache_dir)
+        key = digest('abc')
+        self._write_csv(cache, key)
+
+        with self.assertLogs('utils.result_cache', level='WARNING'):
+            cache.put(key, {'not json': object()})
+
+        self.assertEqual(os.listdir(self.cache_dir), [f"{key}_converted.csv"])
+        self.assertIsNone(cache.get(key))
+
+if __name__ == '__main__':
+    unittest.main()
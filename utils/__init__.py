@@ -2,7 +2,25 @@
 Utility modules for file conversion and data processing
 """
 
-from .data_processor import DataProcessor
-from .validators import FileValidator
+import importlib
 
-__all__ = ['DataProcessor', 'FileValidator']
+# Utilities are imported on first access, so worker processes that only need one of
+# them (e.g. process_pool) don't load pandas, Flask or orjson as well
+_EXPORTS = {
+    'DataProcessor': 'data_processor',
+    'FileValidator': 'validators',
+    'ResultCache': 'result_cache',
+    'FileSweeper': 'file_sweeper',
+    'OrjsonProvider': 'json_provider',
+    'OcrCache': 'ocr_cache',
+    'SharedProcessPool': 'process_pool',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
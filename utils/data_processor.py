@@ -2,12 +2,28 @@ import logging
 import pandas as pd
 import csv
 import io
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, TextIO
 import re
+from collections import defaultdict
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Patterns used per cell, compiled once instead of going through re's cache on every call
+_CURRENCY_RE = re.compile(r'[$£€¥₹,]')
+_NUMERIC_RE = re.compile(r'^[\d.,%-]+$')
+_HEADER_BAD_RE = re.compile(r'[^\w\s-]')
+_WS_RE = re.compile(r'\s+')
+_DIGIT_RE = re.compile(r'\d')
+
+# Plain ASCII integers and decimals always parse. Anything else can only parse through
+# int()/float()'s rarer forms: exponents, underscores, whitespace, non-ASCII digits, inf/nan.
+_PLAIN_NUMBER_RE = re.compile(r'[+-]?(?:\d+(?:\.\d*)?|\.\d+)', re.ASCII)
+_EXOTIC_NUMBER_RE = re.compile(r'[e_\s]|[^\x00-\x7f]|inf|nan', re.IGNORECASE)
+
+# Characters other than digits that a number can start with once whitespace is stripped
+_NUMBER_START_CHARS = frozenset('-+.$£€¥₹,')
+
 class DataProcessor:
     """Process and convert extracted table data to CSV format"""
     
@@ -23,7 +39,25 @@ class DataProcessor:
             original_filename: Name of original file
             
         Returns:
-            Dictionary containing CSV conversion results
+            Dictionary containing CSV conversion results, with the CSV text as csv_content
+        """
+        output = io.StringIO()
+        result = self.write_csv(tables_data, original_filename, output)
+        if result['success']:
+            result['csv_content'] = output.getvalue()
+        return result
+    
+    def write_csv(self, tables_data: List[Dict], original_filename: str, out_file: TextIO) -> Dict[str, Any]:
+        """
+        Convert extracted table data to CSV and stream it into a file
+        
+        Args:
+            tables_data: List of extracted table data
+            original_filename: Name of original file
+            out_file: Text file to write to, opened with newline=''
+            
+        Returns:
+            Dictionary containing CSV conversion results, without the CSV text
         """
         try:
             logger.info(f"Converting {len(tables_data)} tables to CSV")
@@ -71,16 +105,16 @@ class DataProcessor:
                     'message': 'No valid data found in tables'
                 }
             
-            # Convert to CSV string
-            csv_content = self._generate_csv_content(combined_data)
+            # Write CSV rows
+            self._write_csv_rows(combined_data, out_file)
             
-            # Calculate statistics
+            # Calculate statistics in one pass, shared with validation
+            table_stats = self._scan_table(combined_data)
             total_rows = len(combined_data)
-            total_columns = max(len(row) for row in combined_data) if combined_data else 0
+            total_columns = table_stats['max_columns']
             
             result = {
                 'success': True,
-                'csv_content': csv_content,
                 'row_count': total_rows,
                 'column_count': total_columns,
                 'table_count': len(tables_data),
@@ -88,7 +122,7 @@ class DataProcessor:
                 'conversion_stats': {
                     'original_filename': original_filename,
                     'conversion_timestamp': datetime.now().isoformat(),
-                    'data_validation': self._validate_csv_data(combined_data)
+                    'data_validation': self._validate_csv_data(combined_data, table_stats)
                 }
             }
             
@@ -117,27 +151,24 @@ class DataProcessor:
             return []
         
         cleaned_data = []
+        clean_cell = self._clean_cell_content
         
         for row in table_data:
             if not row:
                 continue
             
-            cleaned_row = []
-            for cell in row:
-                # Clean cell content
-                cleaned_cell = self._clean_cell_content(cell)
-                cleaned_row.append(cleaned_cell)
+            # Clean cell content
+            cleaned_row = [clean_cell(cell) for cell in row]
             
-            # Only add rows with some content
-            if any(cell.strip() for cell in cleaned_row):
+            # Only add rows with some content; cleaned cells are stripped, so blank means ''
+            if any(cleaned_row):
                 cleaned_data.append(cleaned_row)
         
         # Ensure all rows have the same number of columns
         if cleaned_data:
-            max_columns = max(len(row) for row in cleaned_data)
+            max_columns = max(map(len, cleaned_data))
             for row in cleaned_data:
-                while len(row) < max_columns:
-                    row.append('')
+                row.extend([''] * (max_columns - len(row)))
         
         return cleaned_data
     
@@ -157,28 +188,26 @@ class DataProcessor:
         # Convert to string if not already
         cell = str(cell)
         
-        # Remove extra whitespace
+        # Remove extra whitespace; this also turns carriage returns into spaces
         cell = ' '.join(cell.split())
         
-        # Remove or replace problematic characters
+        # Remove problematic characters. replace() returns the same string untouched when
+        # the character is absent, which beats a translate() pass for typical cells.
         cell = cell.replace('\x00', '')  # Null bytes
         cell = cell.replace('\ufeff', '')  # BOM
-        cell = cell.replace('\r', ' ')  # Carriage returns
         
         # Normalize quotes
         cell = cell.replace('"', '""')  # Escape quotes for CSV
         
-        # Handle numeric data
-        cell = self._normalize_numeric_data(cell)
-        
-        return cell.strip()
+        # Handle numeric data; strip first so the leading-character check sees the value
+        return self._normalize_numeric_data(cell.strip())
     
     def _normalize_numeric_data(self, cell: str) -> str:
         """
         Normalize numeric data in cells
         
         Args:
-            cell: Cell content
+            cell: Cell content, stripped of surrounding whitespace
             
         Returns:
             Normalized cell content
@@ -186,8 +215,19 @@ class DataProcessor:
         if not cell:
             return cell
         
+        # Prose is ruled out by its first character before any regex or parse work;
+        # percentages still go through the branch below
+        first_char = cell[0]
+        if not first_char.isdigit() and first_char not in _NUMBER_START_CHARS and '%' not in cell:
+            return cell
+        
         # Remove common currency symbols and thousands separators
-        numeric_cell = re.sub(r'[$£€¥₹,]', '', cell)
+        numeric_cell = _CURRENCY_RE.sub('', cell)
+        
+        # Without a digit only float('inf'/'nan') could parse, and that is only reached
+        # through the percentage branch; skip the raising int()/float() calls for text
+        if '%' not in cell and not _DIGIT_RE.search(numeric_cell):
+            return cell
         
         # Handle percentage values
         if '%' in cell:
@@ -197,6 +237,15 @@ class DataProcessor:
             except ValueError:
                 pass
         
+        # Unsigned ASCII integers, the most common numeric cell, need no parsing at all
+        if numeric_cell.isdigit() and numeric_cell.isascii():
+            return numeric_cell.lstrip('0') or '0'
+        
+        # Skip the raising int()/float() calls for values such as dates or codes that
+        # cannot be numbers
+        if not _PLAIN_NUMBER_RE.fullmatch(numeric_cell) and not _EXOTIC_NUMBER_RE.search(numeric_cell):
+            return cell
+        
         # Try to identify and format numbers
         try:
             # Check if it's a float
@@ -239,22 +288,18 @@ class DataProcessor:
                     cleaned_headers.append(f'Column_{i + 1}')
                 else:
                     # Clean header text
-                    clean_header = re.sub(r'[^\w\s-]', '', header.strip())
-                    clean_header = re.sub(r'\s+', '_', clean_header)
+                    clean_header = _HEADER_BAD_RE.sub('', header.strip())
+                    clean_header = _WS_RE.sub('_', clean_header)
                     cleaned_headers.append(clean_header or f'Column_{i + 1}')
             
             # Ensure unique headers
             unique_headers = []
-            header_counts = {}
+            header_counts = defaultdict(int)
             
             for header in cleaned_headers:
-                if header in header_counts:
-                    header_counts[header] += 1
-                    unique_header = f"{header}_{header_counts[header]}"
-                else:
-                    header_counts[header] = 0
-                    unique_header = header
-                unique_headers.append(unique_header)
+                seen = header_counts[header]
+                unique_headers.append(f"{header}_{seen}" if seen else header)
+                header_counts[header] = seen + 1
             
             processed_data = [unique_headers] + table_data[1:]
             return processed_data
@@ -291,47 +336,70 @@ class DataProcessor:
                 continue
             
             # Headers are typically text
-            if not re.match(r'^[\d.,%-]+$', cell.strip()):
+            first_is_text = not _NUMERIC_RE.match(cell.strip())
+            if first_is_text:
                 header_indicators += 1
-            
-            # Compare with second row if available
-            if i < len(second_row) and second_row[i]:
-                first_is_text = not re.match(r'^[\d.,%-]+$', cell.strip())
-                second_is_number = re.match(r'^[\d.,%-]+$', second_row[i].strip())
                 
-                if first_is_text and second_is_number:
+                # A text cell above a number is a second hint
+                if i < len(second_row) and second_row[i] and _NUMERIC_RE.match(second_row[i].strip()):
                     header_indicators += 1
         
         # Consider it headers if more than half the cells look like headers
         return header_indicators > len(first_row) * 0.5
     
-    def _generate_csv_content(self, table_data: List[List[str]]) -> str:
+    def _write_csv_rows(self, table_data: List[List[str]], out_file: TextIO) -> None:
         """
-        Generate CSV content from table data
+        Write table data as CSV rows
         
         Args:
             table_data: Processed table data
+            out_file: Text file to write to
+        """
+        writer = csv.writer(out_file, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        
+        # writerows iterates in C; rows stay ragged so table separators keep one field
+        writer.writerows(table_data)
+    
+    def _scan_table(self, table_data: List[List[str]]) -> Dict[str, Any]:
+        """
+        Collect row and cell counts in a single pass over the table
+        
+        Args:
+            table_data: Cleaned table data, where every blank cell is ''
             
         Returns:
-            CSV content as string
+            Dictionary of cell, empty-cell and empty-row counts plus column widths
         """
-        output = io.StringIO()
-        writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        total_cells = 0
+        empty_cells = 0
+        empty_rows = 0
+        column_counts = set()
         
         for row in table_data:
-            writer.writerow(row)
-        
-        csv_content = output.getvalue()
-        output.close()
+            row_length = len(row)
+            row_empty_cells = row.count('')
+            
+            total_cells += row_length
+            empty_cells += row_empty_cells
+            if row_empty_cells == row_length:
+                empty_rows += 1
+            column_counts.add(row_length)
         
-        return csv_content
+        return {
+            'total_cells': total_cells,
+            'empty_cells': empty_cells,
+            'empty_rows': empty_rows,
+            'column_counts': column_counts,
+            'max_columns': max(column_counts) if column_counts else 0
+        }
     
-    def _validate_csv_data(self, table_data: List[List[str]]) -> Dict[str, Any]:
+    def _validate_csv_data(self, table_data: List[List[str]], table_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Validate CSV data quality
         
         Args:
             table_data: Table data to validate
+            table_stats: Result of _scan_table for table_data, if already computed
             
         Returns:
             Validation results
@@ -342,22 +410,25 @@ class DataProcessor:
                 'issues': ['No data to validate']
             }
         
+        if table_stats is None:
+            table_stats = self._scan_table(table_data)
+        
         issues = []
         warnings = []
         
         # Check for empty rows
-        empty_rows = sum(1 for row in table_data if not any(cell.strip() for cell in row))
+        empty_rows = table_stats['empty_rows']
         if empty_rows > 0:
             warnings.append(f'{empty_rows} empty rows found')
         
         # Check for inconsistent column counts
-        column_counts = [len(row) for row in table_data]
-        if len(set(column_counts)) > 1:
-            issues.append(f'Inconsistent column counts: {set(column_counts)}')
+        column_counts = table_stats['column_counts']
+        if len(column_counts) > 1:
+            issues.append(f'Inconsistent column counts: {column_counts}')
         
         # Check for very sparse data
-        total_cells = sum(len(row) for row in table_data)
-        empty_cells = sum(sum(1 for cell in row if not cell.strip()) for row in table_data)
+        total_cells = table_stats['total_cells']
+        empty_cells = table_stats['empty_cells']
         
         if total_cells > 0:
             sparsity = empty_cells / total_cells
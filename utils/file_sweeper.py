@@ -0,0 +1,96 @@
+import logging
+import os
+import queue
+import threading
+import time
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+class FileSweeper:
+    """Delete temporary files off the request path and expire stale ones"""
+
+    def __init__(self, folders: List[str], max_age: float = 3600, interval: float = 300):
+        self.folders = folders
+        self.max_age = max_age
+        self.interval = interval
+        self._pending = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # Threads don't survive a fork; the child starts its own sweeper on first use
+        self._pending = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self) -> None:
+        """Start the background sweeper thread unless it is already running in this process"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='file-sweeper', daemon=True)
+                self._thread.start()
+
+    def discard(self, path: str) -> None:
+        """
+        Queue a file for deletion, starting the sweeper thread if needed
+
+        Args:
+            path: Path of the file to delete
+        """
+        self.start()
+        self._pending.put(path)
+
+    def _run(self) -> None:
+        next_sweep = time.monotonic()
+        while True:
+            timeout = max(0.0, next_sweep - time.monotonic())
+            try:
+                self._remove(self._pending.get(timeout=timeout))
+                continue
+            except queue.Empty:
+                pass
+
+            self.sweep()
+            next_sweep = time.monotonic() + self.interval
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove temp file {path}: {str(e)}")
+
+    def sweep(self) -> None:
+        """Delete files older than max_age and remove emptied subdirectories"""
+        cutoff = time.time() - self.max_age
+        for folder in self.folders:
+            self._sweep_dir(folder, cutoff)
+
+    def _sweep_dir(self, path: str, cutoff: float) -> bool:
+        """Sweep one directory; returns True if it is left empty"""
+        empty = True
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.name.startswith('.'):
+                            empty = False
+                        elif entry.is_dir(follow_symlinks=False):
+                            if self._sweep_dir(entry.path, cutoff):
+                                os.rmdir(entry.path)
+                            else:
+                                empty = False
+                        elif entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                            os.remove(entry.path)
+                        else:
+                            empty = False
+                    except OSError:
+                        empty = False
+        except OSError as e:
+            logger.warning(f"Sweep of {path} failed: {str(e)}")
+            return False
+
+        return empty
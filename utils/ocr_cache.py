@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class OcrCache:
+    """Two-level (memory LRU + JSON files on disk) cache of OCR output keyed by image content"""
+
+    def __init__(self, cache_dir: str, max_entries: int = 256, max_bytes: int = 100 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # Running size of the disk entries, filled in by the first eviction scan. Other
+        # processes share the directory, so it is only an estimate: eviction rescans
+        # before deleting anything and resets it.
+        self._disk_bytes = None
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"OCR disk cache disabled, cannot create {cache_dir}: {str(e)}")
+            self.cache_dir = None
+
+    @staticmethod
+    def make_key(image: np.ndarray, *parts: str) -> str:
+        """
+        Build a cache key from image pixels and the settings that affect OCR output
+
+        Args:
+            image: Image passed to Tesseract
+            parts: Extra strings such as the OCR call, config and Tesseract version
+
+        Returns:
+            Hex digest identifying the OCR request
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{image.shape}{image.dtype}".encode())
+        digest.update(np.ascontiguousarray(image).data)
+        for part in parts:
+            digest.update(b'\0')
+            digest.update(part.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return cached OCR output, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if self.cache_dir is None:
+            return None
+
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as cache_file:
+                value = json.load(cache_file)
+            # Refresh mtime so eviction treats this entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable OCR cache entry {key}: {str(e)}")
+            return None
+
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store JSON-serializable OCR output in memory and on disk"""
+        self._remember(key, value)
+
+        if self.cache_dir is None:
+            return
+
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            # Write beside the final path and rename, so get() never reads a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{key}.", suffix='.part')
+            try:
+                with open(fd, 'w', encoding='utf-8') as cache_file:
+                    json.dump(value, cache_file)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            entry_bytes = os.path.getsize(path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Failed to write OCR cache entry {key}: {str(e)}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += entry_bytes
+            needs_eviction = self._disk_bytes is None or self._disk_bytes > self.max_bytes
+        if needs_eviction:
+            self._evict()
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        """Rescan the disk cache and remove least recently used entries until it fits in max_bytes"""
+        entries = []
+        total_bytes = 0
+
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith('.json') or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_bytes += stat.st_size
+        except OSError as e:
+            logger.warning(f"OCR cache eviction scan failed: {str(e)}")
+            return
+
+        if total_bytes > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total_bytes -= size
+                except OSError:
+                    pass
+
+        with self._lock:
+            self._disk_bytes = total_bytes
@@ -0,0 +1,66 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# The web process runs request and sweeper threads, so workers must not be forked from it;
+# forkserver children start from a clean single-threaded server process instead
+WORKER_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+class SharedProcessPool:
+    """Process pool created on first use and shared by every caller in the process"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def set_max_workers(self, workers: int) -> None:
+        """
+        Change the worker limit; call before the pool is first used
+
+        Args:
+            workers: Maximum number of worker processes; 1 keeps all work in the caller
+        """
+        self.max_workers = max(1, workers)
+        # Typically called in a freshly forked worker: never reuse the parent's pool object,
+        # and replace a lock that another parent thread may have held at fork time
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """
+        Run fn over items in the pool and return the results in order
+
+        Args:
+            fn: Picklable module-level function
+            items: Picklable arguments, one per call
+
+        Returns:
+            List of results
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=WORKER_MP_CONTEXT)
+            executor = self._executor
+
+        try:
+            return list(executor.map(fn, items))
+        except BrokenProcessPool:
+            # A crashed worker poisons the pool; start a fresh one on the next call
+            logger.warning("Shared process pool broke, it will be recreated")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+# Splits single large documents across processes. Every caller shares these workers, so
+# concurrent requests queue for them instead of each starting cpu_count processes.
+subfile_pool = SharedProcessPool()
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import re
+import tempfile
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Files the cache owns: a SHA-256 hex digest plus the CSV or metadata suffix. In-flight
+# .part files and anything else in the directory are never counted or evicted.
+_ENTRY_NAME = re.compile(r'[0-9a-f]{64}(?:_converted\.csv|\.json)')
+
+class ResultCache:
+    """Cache converted CSV files and their metadata by upload content hash"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Running size of the cache directory, filled in by the first eviction scan. Other
+        # processes write here too, so it is only an estimate: eviction rescans before
+        # deleting anything and resets it.
+        self._total_bytes = None
+
+    def csv_path(self, content_hash: str) -> str:
+        """Path of the cached CSV for a content hash"""
+        return os.path.join(self.cache_dir, f"{content_hash}_converted.csv")
+
+    def _meta_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up cached conversion metadata
+
+        Args:
+            content_hash: Hex digest of the uploaded file bytes
+
+        Returns:
+            Cached metadata dictionary, or None on a miss
+        """
+        csv_path = self.csv_path(content_hash)
+        meta_path = self._meta_path(content_hash)
+
+        if not (os.path.exists(csv_path) and os.path.exists(meta_path)):
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as meta_file:
+                metadata = json.load(meta_file)
+
+            # Refresh mtimes so eviction treats this entry as recently used
+            os.utime(csv_path)
+            os.utime(meta_path)
+            return metadata
+
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {content_hash}: {str(e)}")
+            return None
+
+    def put(self, content_hash: str, metadata: Dict[str, Any]) -> None:
+        """
+        Store conversion metadata next to an already written CSV
+
+        Args:
+            content_hash: Hex digest of the uploaded file bytes
+            metadata: JSON-serializable conversion results
+        """
+        csv_path = self.csv_path(content_hash)
+        meta_path = self._meta_path(content_hash)
+
+        try:
+            # Write beside the final path and rename, so get() never reads partial metadata
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{content_hash}.", suffix='.part')
+            try:
+                with open(fd, 'w', encoding='utf-8') as meta_file:
+                    json.dump(metadata, meta_file)
+                os.replace(temp_path, meta_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Failed to write cache entry {content_hash}: {str(e)}")
+            return
+
+        try:
+            entry_bytes = os.path.getsize(csv_path) + os.path.getsize(meta_path)
+        except OSError:
+            # Already evicted by another process; the next rescan settles the total
+            entry_bytes = 0
+
+        if self._total_bytes is not None:
+            self._total_bytes += entry_bytes
+        if self._total_bytes is None or self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Rescan the cache and remove least recently used files until it fits in max_bytes"""
+        entries = []
+        total_bytes = 0
+
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not _ENTRY_NAME.fullmatch(entry.name) or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_bytes += stat.st_size
+        except OSError as e:
+            logger.warning(f"Cache eviction scan failed: {str(e)}")
+            return
+
+        self._total_bytes = total_bytes
+        if total_bytes <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+            except OSError:
+                pass
+
+        self._total_bytes = total_bytes
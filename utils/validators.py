@@ -1,10 +1,40 @@
 import logging
 import os
-from typing import Dict, Any
+import re
+from typing import Dict, Any, Optional
 from werkzeug.datastructures import FileStorage
 
 logger = logging.getLogger(__name__)
 
+SUSPICIOUS_PATTERNS = [
+    '../', '..\\',  # Path traversal
+    '<script', '</script>',  # Script injection
+    '<?php', '?>',  # PHP code
+    '<%', '%>',  # ASP code
+    'javascript:',  # JavaScript protocol
+    'data:',  # Data URI
+]
+_SUSPICIOUS_RE = re.compile('|'.join(map(re.escape, SUSPICIOUS_PATTERNS)))
+
+# Magic bytes for each supported file type
+_MAGIC_BYTES = {
+    '.pdf': (b'%PDF',),
+    '.png': (b'\x89PNG',),
+    '.jpg': (b'\xff\xd8\xff',),
+    '.jpeg': (b'\xff\xd8\xff',),
+    '.bmp': (b'BM',),
+    '.tiff': (b'II*\x00', b'MM\x00*'),
+    '.docx': (b'PK\x03\x04',),  # ZIP-based format
+}
+
+# Executable signatures grouped by their first byte
+_EXECUTABLE_SIGNATURES = {
+    b'M': (b'MZ',),  # Windows executable
+    b'\x7f': (b'\x7fELF',),  # Linux executable
+    b'\xca': (b'\xca\xfe\xba\xbe',),  # Java class file
+    b'#': (b'#!/bin/', b'#!/usr/bin/'),  # Shell script
+}
+
 class FileValidator:
     """Validate uploaded files for security and format compliance"""
     
@@ -42,12 +72,7 @@ class FileValidator:
             
             # Get file extension
             filename = file.filename.lower()
-            file_extension = None
-            
-            for ext in self.allowed_extensions.keys():
-                if filename.endswith(ext):
-                    file_extension = ext
-                    break
+            file_extension = self._match_extension(filename)
             
             if not file_extension:
                 return {
@@ -55,10 +80,13 @@ class FileValidator:
                     'message': f'Unsupported file format. Allowed formats: {", ".join(self.allowed_extensions.keys())}'
                 }
             
+            # Reject bad names before touching the file stream
+            filename_result = self._check_filename(filename)
+            if not filename_result['valid']:
+                return filename_result
+            
             # Check file size
-            file.seek(0, os.SEEK_END)
-            file_size = file.tell()
-            file.seek(0)  # Reset file pointer
+            file_size = self._file_size(file)
             
             if file_size < self.min_file_size:
                 return {
@@ -81,16 +109,14 @@ class FileValidator:
                 # Don't fail validation for MIME type mismatch, just log warning
             
             # Basic file content validation
-            file.seek(0)
-            file_header = file.read(512)  # Read first 512 bytes
-            file.seek(0)  # Reset file pointer
+            file_header = self._read_header(file)
             
             validation_result = self._validate_file_header(file_header, file_extension)
             if not validation_result['valid']:
                 return validation_result
             
             # Security checks
-            security_result = self._security_checks(filename, file_header)
+            security_result = self._security_checks(file_header)
             if not security_result['valid']:
                 return security_result
             
@@ -109,6 +135,69 @@ class FileValidator:
                 'message': f'File validation failed: {str(e)}'
             }
     
+    def _file_size(self, file: FileStorage) -> int:
+        """
+        Get the size of an uploaded file
+        
+        Args:
+            file: Uploaded file object
+            
+        Returns:
+            Size in bytes
+        """
+        # Uploads spooled to disk answer with one fstat. The client-sent Content-Length
+        # is not used: multipart parts rarely carry one and it can't be trusted for limits.
+        try:
+            return os.fstat(file.stream.fileno()).st_size
+        except (AttributeError, OSError, ValueError):
+            pass
+        
+        # In-memory streams: measure by seeking to the end
+        file.seek(0, os.SEEK_END)
+        file_size = file.tell()
+        file.seek(0)  # Reset file pointer
+        return file_size
+    
+    def _read_header(self, file: FileStorage, length: int = 512) -> bytes:
+        """
+        Read the first bytes of an uploaded file without moving its file pointer
+        
+        Args:
+            file: Uploaded file object
+            length: Number of bytes to read
+            
+        Returns:
+            Header bytes
+        """
+        # Disk-backed uploads are read with one positioned read instead of seek/read/seek
+        try:
+            return os.pread(file.stream.fileno(), length, 0)
+        except (AttributeError, OSError, ValueError):
+            pass
+        
+        file.seek(0)
+        file_header = file.read(length)
+        file.seek(0)  # Reset file pointer
+        return file_header
+    
+    def _match_extension(self, filename: str) -> Optional[str]:
+        """
+        Find the allowed extension a lowercased filename ends with
+        
+        Args:
+            filename: Lowercased file name
+            
+        Returns:
+            Matching extension, or None if the file type is not allowed
+        """
+        # Every allowed extension is a single dot-suffix, so the text after the last
+        # dot decides the match with one dict lookup
+        dot = filename.rfind('.')
+        if dot < 0:
+            return None
+        extension = filename[dot:]
+        return extension if extension in self.allowed_extensions else None
+    
     def _validate_file_header(self, file_header: bytes, file_extension: str) -> Dict[str, Any]:
         """
         Validate file header/magic bytes
@@ -127,32 +216,13 @@ class FileValidator:
                     'message': 'File appears to be empty or corrupted'
                 }
             
-            # Define magic bytes for different file types
-            magic_bytes = {
-                '.pdf': [b'%PDF'],
-                '.png': [b'\x89PNG'],
-                '.jpg': [b'\xff\xd8\xff'],
-                '.jpeg': [b'\xff\xd8\xff'],
-                '.bmp': [b'BM'],
-                '.tiff': [b'II*\x00', b'MM\x00*'],
-                '.docx': [b'PK\x03\x04']  # ZIP-based format
-            }
-            
-            if file_extension in magic_bytes:
-                expected_magic = magic_bytes[file_extension]
-                
-                # Check if file header starts with any of the expected magic bytes
-                header_match = False
-                for magic in expected_magic:
-                    if file_header.startswith(magic):
-                        header_match = True
-                        break
-                
-                if not header_match:
-                    return {
-                        'valid': False,
-                        'message': f'File header does not match expected format for {file_extension}'
-                    }
+            # Check if file header starts with any of the expected magic bytes
+            expected_magic = _MAGIC_BYTES.get(file_extension)
+            if expected_magic and not file_header.startswith(expected_magic):
+                return {
+                    'valid': False,
+                    'message': f'File header does not match expected format for {file_extension}'
+                }
             
             return {'valid': True}
             
@@ -163,51 +233,46 @@ class FileValidator:
                 'message': 'Failed to validate file header'
             }
     
-    def _security_checks(self, filename: str, file_header: bytes) -> Dict[str, Any]:
+    def _check_filename(self, filename: str) -> Dict[str, Any]:
         """
-        Perform security checks on the file
+        Check the file name for path traversal and injection patterns
         
         Args:
             filename: Name of the file
+            
+        Returns:
+            Security validation result
+        """
+        # One regex pass; on a hit, report the first pattern in list order
+        filename_lower = filename.lower()
+        if _SUSPICIOUS_RE.search(filename_lower):
+            pattern = next(p for p in SUSPICIOUS_PATTERNS if p in filename_lower)
+            return {
+                'valid': False,
+                'message': f'Suspicious filename pattern detected: {pattern}'
+            }
+        
+        return {'valid': True}
+    
+    def _security_checks(self, file_header: bytes) -> Dict[str, Any]:
+        """
+        Perform security checks on the file contents
+        
+        Args:
             file_header: File header bytes
             
         Returns:
             Security validation result
         """
         try:
-            # Check for suspicious filename patterns
-            suspicious_patterns = [
-                '../', '..\\',  # Path traversal
-                '<script', '</script>',  # Script injection
-                '<?php', '?>',  # PHP code
-                '<%', '%>',  # ASP code
-                'javascript:',  # JavaScript protocol
-                'data:',  # Data URI
-            ]
-            
-            filename_lower = filename.lower()
-            for pattern in suspicious_patterns:
-                if pattern in filename_lower:
-                    return {
-                        'valid': False,
-                        'message': f'Suspicious filename pattern detected: {pattern}'
-                    }
-            
-            # Check for embedded executables or scripts in file header
-            executable_signatures = [
-                b'MZ',  # Windows executable
-                b'\x7fELF',  # Linux executable
-                b'\xca\xfe\xba\xbe',  # Java class file
-                b'#!/bin/',  # Shell script
-                b'#!/usr/bin/',  # Shell script
-            ]
-            
-            for signature in executable_signatures:
-                if file_header.startswith(signature):
-                    return {
-                        'valid': False,
-                        'message': 'File appears to contain executable code'
-                    }
+            # Check for embedded executables or scripts in file header; the first byte
+            # picks the only signatures that could match
+            signatures = _EXECUTABLE_SIGNATURES.get(file_header[:1])
+            if signatures and file_header.startswith(signatures):
+                return {
+                    'valid': False,
+                    'message': 'File appears to contain executable code'
+                }
             
             # Check file size limits per type
             max_sizes = {
@@ -246,17 +311,11 @@ class FileValidator:
                 return {}
             
             # Get file size
-            file.seek(0, os.SEEK_END)
-            file_size = file.tell()
-            file.seek(0)
+            file_size = self._file_size(file)
             
             # Get file extension
             filename = file.filename.lower()
-            file_extension = None
-            for ext in self.allowed_extensions.keys():
-                if filename.endswith(ext):
-                    file_extension = ext
-                    break
+            file_extension = self._match_extension(filename)
             
             return {
                 'filename': file.filename,